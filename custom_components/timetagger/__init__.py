@@ -1,30 +1,73 @@
 from __future__ import annotations
 
+from typing import Any
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.const import Platform
+from homeassistant.helpers import entity_registry as er
 
 from .const import DOMAIN
-from .coordinator import TimeTaggerCoordinator
+from .coordinator import TimeTaggerCoordinator, async_remove_cache
+from .statistics import async_remove_statistics
 
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up TimeTagger from a config entry."""
-    coordinator = TimeTaggerCoordinator(hass, entry.data)
-    await coordinator.async_config_entry_first_refresh()
+    coordinator = TimeTaggerCoordinator(hass, entry.data, entry.entry_id)
+    if await coordinator.async_load_cache():
+        # Publish the cached records right away and refresh in the background
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN}_refresh_{entry.entry_id}"
+        )
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            # Leave the shared updates feed of the account
+            await coordinator.async_shutdown()
+            raise
 
+    await _async_migrate_unique_ids(hass, entry)
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # Importing the history can take a while, it must not delay the setup
+    entry.async_create_background_task(
+        hass,
+        coordinator.async_backfill_statistics(),
+        f"{DOMAIN}_backfill_{entry.entry_id}",
+    )
     return True
 
 
+async def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Prefix the unique ids of older versions with the config entry id."""
+
+    @callback
+    def migrate(entity_entry: er.RegistryEntry) -> dict[str, Any] | None:
+        if not entity_entry.unique_id.startswith(f"{DOMAIN}_"):
+            return None
+        return {"new_unique_id": f"{entry.entry_id}_{entity_entry.unique_id}"}
+
+    await er.async_migrate_entries(hass, entry.entry_id, migrate)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok and DOMAIN in hass.data:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        if (coordinator := hass.data[DOMAIN].pop(entry.entry_id, None)) is not None:
+            await coordinator.async_shutdown()
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the record cache and statistics of a deleted config entry."""
+    await async_remove_cache(hass, entry.entry_id)
+    if "recorder" in hass.config.components:
+        async_remove_statistics(hass, entry.entry_id)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+import random
+import time
+
+from .const import BREAKER_THRESHOLD, REFRESH_RETRY_DELAY, REFRESH_RETRY_DELAY_MAX
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    cap: float,
+    rand: Callable[[float, float], float] = random.uniform,
+) -> float:
+    """Return the seconds to wait before a retry, doubling per attempt.
+
+    The delay is capped and its second half is random, so clients that
+    failed together do not retry in lockstep.
+    """
+    delay = min(cap, base * 2.0 ** min(attempt, 32))
+    return delay / 2 + rand(0.0, delay / 2)
+
+
+class CircuitBreaker:
+    """Refuses requests to a failing server for a growing cool-down.
+
+    Every failure in a row doubles the delay before the next attempt.
+    From the threshold on the breaker is open: requests are refused until
+    the delay passed, then a single attempt may probe the server. A
+    success closes the breaker again.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        base: float = REFRESH_RETRY_DELAY,
+        cap: float = REFRESH_RETRY_DELAY_MAX,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._threshold = threshold
+        self._base = base
+        self._cap = cap
+        self._clock = clock
+        self.failures = 0
+        self._open_until = 0.0
+
+    @property
+    def state(self) -> str:
+        """Return closed, open or half_open."""
+        if self.failures < self._threshold:
+            return "closed"
+        return "open" if self.retry_in > 0 else "half_open"
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until requests are allowed again."""
+        return max(0.0, self._open_until - self._clock())
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent."""
+        return self.retry_in == 0
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        self.failures = 0
+        self._open_until = 0.0
+
+    def record_failure(self) -> float:
+        """Count a failed request; return the seconds until the next attempt."""
+        self.failures += 1
+        delay = backoff_delay(self.failures - 1, self._base, self._cap)
+        if self.failures >= self._threshold:
+            self._open_until = self._clock() + delay
+        return delay
+
+    def as_dict(self) -> dict[str, object]:
+        """Return the breaker state for the diagnostics."""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in": round(self.retry_in, 1),
+        }
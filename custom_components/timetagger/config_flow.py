@@ -13,10 +13,34 @@ from .const import (
     CONF_TOKEN,
     CONF_WORK_TAGS,
     CONF_DAILY_TARGET,
+    CONF_WORKDAY_START,
+    CONF_WORKDAY_END,
+    CONF_HISTORY_DAYS,
+    CONF_TAG_GROUPS,
+    CONF_TAG_BREAKDOWN,
+    CONF_WEEKLY_SCHEDULE,
+    CONF_HOLIDAYS,
+    CONF_VACATION,
+    CONF_REQUEST_TIMEOUT,
     DEFAULT_API_URL,
     DEFAULT_WORK_TAGS,
     DEFAULT_DAILY_TARGET,
+    DEFAULT_WORKDAY_START,
+    DEFAULT_WORKDAY_END,
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_TAG_GROUPS,
+    DEFAULT_TAG_BREAKDOWN,
+    DEFAULT_WEEKLY_SCHEDULE,
+    DEFAULT_HOLIDAYS,
+    DEFAULT_VACATION,
+    DEFAULT_REQUEST_TIMEOUT,
 )
+from .records import parse_tag_groups
+from .targets import parse_days, parse_schedule
+
+_HOUR = vol.All(vol.Coerce(int), vol.Range(min=0, max=24))
+_DAYS = vol.All(vol.Coerce(int), vol.Range(min=0, max=3650))
+_SECONDS = vol.All(vol.Coerce(int), vol.Range(min=5, max=300))
 
 
 class TimeTaggerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -56,7 +80,23 @@ class TimeTaggerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             api_url = user_input[CONF_API_URL]
             if not api_url.startswith("http"):
                 errors["base"] = "invalid_url"
-            else:
+            start = user_input.get(CONF_WORKDAY_START, DEFAULT_WORKDAY_START)
+            if start >= user_input.get(CONF_WORKDAY_END, DEFAULT_WORKDAY_END):
+                errors[CONF_WORKDAY_END] = "invalid_workday"
+            try:
+                parse_tag_groups(user_input.get(CONF_TAG_GROUPS, ""))
+            except ValueError:
+                errors[CONF_TAG_GROUPS] = "invalid_tag_groups"
+            try:
+                parse_schedule(user_input.get(CONF_WEEKLY_SCHEDULE, ""), 0.0)
+            except ValueError:
+                errors[CONF_WEEKLY_SCHEDULE] = "invalid_schedule"
+            for key in (CONF_HOLIDAYS, CONF_VACATION):
+                try:
+                    parse_days(user_input.get(key, ""))
+                except ValueError:
+                    errors[key] = "invalid_days"
+            if not errors:
                 return self.async_create_entry(
                     title="TimeTagger",
                     data=user_input,
@@ -68,6 +108,19 @@ class TimeTaggerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Required(CONF_TOKEN): str,
                 vol.Optional(CONF_WORK_TAGS, default=DEFAULT_WORK_TAGS): str,
                 vol.Optional(CONF_DAILY_TARGET, default=DEFAULT_DAILY_TARGET): float,
+                vol.Optional(CONF_WORKDAY_START, default=DEFAULT_WORKDAY_START): _HOUR,
+                vol.Optional(CONF_WORKDAY_END, default=DEFAULT_WORKDAY_END): _HOUR,
+                vol.Optional(CONF_HISTORY_DAYS, default=DEFAULT_HISTORY_DAYS): _DAYS,
+                vol.Optional(CONF_TAG_GROUPS, default=DEFAULT_TAG_GROUPS): str,
+                vol.Optional(CONF_TAG_BREAKDOWN, default=DEFAULT_TAG_BREAKDOWN): bool,
+                vol.Optional(
+                    CONF_WEEKLY_SCHEDULE, default=DEFAULT_WEEKLY_SCHEDULE
+                ): str,
+                vol.Optional(CONF_HOLIDAYS, default=DEFAULT_HOLIDAYS): str,
+                vol.Optional(CONF_VACATION, default=DEFAULT_VACATION): str,
+                vol.Optional(
+                    CONF_REQUEST_TIMEOUT, default=DEFAULT_REQUEST_TIMEOUT
+                ): _SECONDS,
             }
         )
 
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from datetime import timedelta
+
 DOMAIN = "timetagger"
 
 CONF_API_URL = "api_url"
@@ -7,7 +9,66 @@ CONF_API_URL = "api_url"
 CONF_TOKEN: str | None = None
 CONF_WORK_TAGS = "work_tags"
 CONF_DAILY_TARGET = "daily_target"
+CONF_WORKDAY_START = "workday_start"
+CONF_WORKDAY_END = "workday_end"
+CONF_HISTORY_DAYS = "history_days"
+CONF_TAG_GROUPS = "tag_groups"
+CONF_TAG_BREAKDOWN = "tag_breakdown"
+CONF_WEEKLY_SCHEDULE = "weekly_schedule"
+CONF_HOLIDAYS = "holidays"
+CONF_VACATION = "vacation"
+CONF_REQUEST_TIMEOUT = "request_timeout"
 
 DEFAULT_DAILY_TARGET = 8.0
 DEFAULT_WORK_TAGS = "#work,#home"
 DEFAULT_API_URL = "https://timetagger-host/timetagger/"
+DEFAULT_WORKDAY_START = 7
+DEFAULT_WORKDAY_END = 19
+DEFAULT_HISTORY_DAYS = 365
+DEFAULT_TAG_GROUPS = ""
+DEFAULT_TAG_BREAKDOWN = False
+# Empty: the daily target from Monday to Friday
+DEFAULT_WEEKLY_SCHEDULE = ""
+DEFAULT_HOLIDAYS = ""
+DEFAULT_VACATION = ""
+# Seconds a single API request may take
+DEFAULT_REQUEST_TIMEOUT = 30
+
+# Adaptive polling: short while a timer runs, backing off while idle
+POLL_INTERVAL_RUNNING = timedelta(minutes=2)
+POLL_INTERVAL_IDLE = timedelta(minutes=5)
+POLL_INTERVAL_IDLE_MAX = timedelta(minutes=30)
+POLL_INTERVAL_OFF_HOURS = timedelta(hours=1)
+# Local recomputation of the totals while a timer runs, no API call
+TICK_INTERVAL = timedelta(minutes=1)
+
+# Number of refreshes the rolling timing percentiles are computed over
+METRICS_WINDOW = 100
+
+# Failed refreshes are retried after a doubling, jittered delay in
+# seconds; from the threshold on the circuit breaker refuses requests
+# until the delay passed
+REFRESH_RETRY_DELAY = 30.0
+REFRESH_RETRY_DELAY_MAX = 1800.0
+BREAKER_THRESHOLD = 3
+
+# Records responses are decoded in chunks of this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Ranges longer than a chunk are fetched as concurrent requests, each
+# retried on its own with a doubling delay in seconds
+FETCH_CHUNK = timedelta(days=7)
+FETCH_CONCURRENCY = 4
+FETCH_RETRIES = 2
+FETCH_RETRY_DELAY = 1.0
+
+# Stores and batches of at least this many records are sorted, indexed
+# and compiled in the executor instead of on the event loop
+EXECUTOR_THRESHOLD = 5000
+
+# History is imported into the statistics one chunk of records at a time
+BACKFILL_CHUNK = timedelta(days=28)
+
+STORAGE_VERSION = 1
+# Debounce cache writes so frequent polls do not wear out SD cards
+CACHE_SAVE_DELAY = 120
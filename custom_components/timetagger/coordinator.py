@@ -1,19 +1,80 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
 from typing import Any
 import logging
+import time
 
 import aiohttp
 import async_timeout
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HassJob, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
 
-from .const import CONF_API_URL, CONF_TOKEN, CONF_WORK_TAGS
+from .const import (
+    CACHE_SAVE_DELAY,
+    CONF_API_URL,
+    CONF_DAILY_TARGET,
+    CONF_HISTORY_DAYS,
+    CONF_HOLIDAYS,
+    CONF_REQUEST_TIMEOUT,
+    CONF_TAG_BREAKDOWN,
+    CONF_TAG_GROUPS,
+    CONF_TOKEN,
+    CONF_VACATION,
+    CONF_WEEKLY_SCHEDULE,
+    CONF_WORK_TAGS,
+    CONF_WORKDAY_END,
+    CONF_WORKDAY_START,
+    DEFAULT_DAILY_TARGET,
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_WORKDAY_END,
+    DEFAULT_WORKDAY_START,
+    DOMAIN,
+    EXECUTOR_THRESHOLD,
+    FETCH_CHUNK,
+    FETCH_CONCURRENCY,
+    FETCH_RETRIES,
+    FETCH_RETRY_DELAY,
+    POLL_INTERVAL_IDLE,
+    POLL_INTERVAL_IDLE_MAX,
+    POLL_INTERVAL_OFF_HOURS,
+    POLL_INTERVAL_RUNNING,
+    STORAGE_VERSION,
+    STREAM_CHUNK_SIZE,
+    TICK_INTERVAL,
+)
+from .backoff import CircuitBreaker, backoff_delay
+from .feed import async_get_feed
+from .metrics import FetchMetrics, RefreshSample
+from .records import (
+    IntervalIndex,
+    RecordStore,
+    RecordStreamDecoder,
+    parse_tag_groups,
+)
+from .statistics import WorkStatistics
+from .targets import TargetCalendar, parse_days, parse_schedule
 
 _LOGGER = logging.getLogger(__name__)
 
+try:
+    from aiohttp.compression_utils import HAS_BROTLI
+except ImportError:  # older aiohttp
+    HAS_BROTLI = False
+
+# Only ask for encodings aiohttp can decompress
+_ACCEPT_ENCODING = "br, gzip" if HAS_BROTLI else "gzip"
+
 
 def _utc_ts(dt: datetime) -> int:
     """Return Unix timestamp (int) in UTC."""
@@ -24,75 +85,759 @@ def _utc_ts(dt: datetime) -> int:
     return int(dt.timestamp())
 
 
-class TimeTaggerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
+@dataclass(frozen=True, slots=True)
+class Periods:
+    """Start of today, this week and this month in the configured time zone.
+
+    The starts only change at local midnight, so they are computed once a
+    day and shared by the fetch window, the totals and the targets.
+    """
+
+    day: date
+    today: datetime
+    week: datetime
+    month: datetime
+    next_day: datetime
+
+    @classmethod
+    def at(cls, now: datetime) -> Periods:
+        """Return the periods of the local day of now."""
+        day = dt_util.as_local(now).date()
+        return cls(
+            day=day,
+            today=dt_util.start_of_local_day(day),
+            week=dt_util.start_of_local_day(day - timedelta(days=day.weekday())),
+            month=dt_util.start_of_local_day(day.replace(day=1)),
+            next_day=dt_util.start_of_local_day(day + timedelta(days=1)),
+        )
+
+    @property
+    def window_start(self) -> datetime:
+        """Return the start of the synced window, covering this week and month."""
+        return min(self.week, self.month)
+
+    def contains(self, now: datetime) -> bool:
+        """Return True if now is on the day of these periods."""
+        return self.today <= now < self.next_day
+
+
+def _time_chunks(start: int, end: int, size: int) -> list[tuple[int, int]]:
+    """Split a time range into consecutive windows of at most size seconds."""
+    chunks = []
+    while end - start > size:
+        chunks.append((start, start + size))
+        start += size
+    chunks.append((start, end))
+    return chunks
+
+
+def _apply_to(store: RecordStore, updates: dict[str, Any], start: float) -> int:
+    """Apply an updates response to a store; return the change count."""
+    records = updates.get("records") or []
+    changed = store.apply(records if isinstance(records, list) else [])
+    store.server_time = float(updates.get("server_time") or store.server_time)
+    changed += store.prune(start)
+    _LOGGER.debug("Applied %s changed TimeTagger records", changed)
+    return changed
+
+
+def _apply_prepared(store: RecordStore, updates: dict[str, Any], start: float) -> int:
+    """Apply an updates response and build the indexes, for the executor."""
+    changed = _apply_to(store, updates, start)
+    store.prepare()
+    return changed
+
+
+def _restore_prepared(store: RecordStore, cached: dict[str, Any]) -> bool:
+    """Restore a store from the cache and build the indexes, for the executor."""
+    if not store.restore(cached):
+        return False
+    store.prepare()
+    return True
+
+
+async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+    """Raise UpdateFailed with the response body for an error status."""
+    if response.status != 200:
+        body = await response.text()
+        raise UpdateFailed(f"TimeTagger API error: {response.status} - {body}")
+
+
+def _cache_store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    """Return the on-disk record cache of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+
+
+async def async_remove_cache(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the on-disk record cache of a config entry."""
+    await _cache_store(hass, entry_id).async_remove()
+
+
+def _poll_interval(
+    now: datetime,
+    running: bool,
+    idle_polls: int,
+    hours: tuple[int, int],
+    workday: bool,
+) -> timedelta:
+    """Return the time until the next poll.
+
+    Poll often while a timer runs, back off exponentially while nothing
+    changes and poll rarely outside the working hours and on days off.
+    """
+    if running:
+        return POLL_INTERVAL_RUNNING
+    start, end = hours
+    if not workday or now.hour >= end:
+        return POLL_INTERVAL_OFF_HOURS
+    if now.hour < start:
+        # Do not sleep past the start of the working day
+        day_start = now.replace(hour=start, minute=0, second=0, microsecond=0)
+        return min(POLL_INTERVAL_OFF_HOURS, day_start - now)
+    backoff = POLL_INTERVAL_IDLE * 2.0 ** min(idle_polls, 8)
+    return min(backoff, POLL_INTERVAL_IDLE_MAX)
+
+
+def _target_calendar(config: dict[str, Any]) -> TargetCalendar:
+    """Return the target calendar of a config entry."""
+    schedule = parse_schedule(
+        config.get(CONF_WEEKLY_SCHEDULE, ""),
+        config.get(CONF_DAILY_TARGET, DEFAULT_DAILY_TARGET),
+    )
+    holidays, yearly_holidays = parse_days(config.get(CONF_HOLIDAYS, ""))
+    vacation, yearly_vacation = parse_days(config.get(CONF_VACATION, ""))
+    return TargetCalendar(
+        schedule, holidays | vacation, yearly_holidays | yearly_vacation
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class GroupHours:
+    """Worked hours of one tag group or tag per period."""
+
+    today: float
+    week: float
+    month: float
+    week_records: int
+
+
+@dataclass(frozen=True, slots=True)
+class TimeTaggerData:
+    """Aggregated working hours, computed once per refresh."""
+
+    today_hours: float
+    week_hours: float
+    month_hours: float
+    week_target: float
+    month_target: float
+    today_records: int
+    week_records: int
+    month_records: int
+    running: bool
+    groups: dict[str, GroupHours] = field(default_factory=dict)
+    tags: dict[str, GroupHours] = field(default_factory=dict)
+
+    @property
+    def week_remaining(self) -> float:
+        """Return the hours left to reach the week target."""
+        return round(self.week_target - self.week_hours, 2)
+
+    @property
+    def month_balance(self) -> float:
+        """Return the over- or under-hours of this month."""
+        return round(self.month_hours - self.month_target, 2)
+
+
+class TimeTaggerCoordinator(DataUpdateCoordinator[TimeTaggerData]):
     """Coordinator for TimeTagger API."""
 
-    def __init__(self, hass: HomeAssistant, config: dict[str, Any]) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config: dict[str, Any],
+        entry_id: str | None = None,
+    ) -> None:
         self._hass = hass
+        # HA's shared session keeps connections alive between polls
+        self._session = async_get_clientsession(hass)
         self._api_url: str = config[CONF_API_URL] + "/api/v2/records"
+        self._updates_url: str = config[CONF_API_URL] + "/api/v2/updates"
         self._token: str = config.get(CONF_TOKEN) or ""
+        self._timeout: int = config.get(CONF_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT)
+        self._breaker = CircuitBreaker()
         self._work_tags: str = config[CONF_WORK_TAGS]
+        self.tag_groups = parse_tag_groups(config.get(CONF_TAG_GROUPS, ""))
+        self._tag_breakdown: bool = config.get(CONF_TAG_BREAKDOWN, False)
+        self.calendar = _target_calendar(config)
+        self._working_hours: tuple[int, int] = (
+            config.get(CONF_WORKDAY_START, DEFAULT_WORKDAY_START),
+            config.get(CONF_WORKDAY_END, DEFAULT_WORKDAY_END),
+        )
+        # Refreshes in a row that did not change any record
+        self._idle_polls = 0
+        self._unsub_tick: CALLBACK_TYPE | None = None
+        self._periods: Periods | None = None
+        self._unsub_rollover: CALLBACK_TYPE | None = None
+        self._store = self._new_store()
+        self._cache = _cache_store(hass, entry_id) if entry_id else None
+        # Entries of the same account share one updates request per poll
+        self._feed = async_get_feed(hass, config[CONF_API_URL], self._token)
+        self._unsub_feed = self._feed.async_subscribe(self)
+        self.metrics = FetchMetrics()
+        self._sample = RefreshSample()
+        # Notified after every refresh, also when the totals did not change
+        self._metrics_listeners: list[CALLBACK_TYPE] = []
+        history_days = config.get(CONF_HISTORY_DAYS, DEFAULT_HISTORY_DAYS)
+        self._statistics = (
+            WorkStatistics(hass, entry_id, history_days)
+            if entry_id and history_days and "recorder" in hass.config.components
+            else None
+        )
 
         super().__init__(
             hass,
             _LOGGER,
             name="TimeTagger Coordinator",
-            update_interval=timedelta(minutes=5),
+            update_interval=POLL_INTERVAL_IDLE,
+            # Refreshes that leave the totals as they were notify no one
+            always_update=False,
         )
 
+    def _new_store(self) -> RecordStore:
+        """Return an empty store for the work tags and tag groups."""
+        return RecordStore(self._work_tags, self.tag_groups)
+
+    def _headers(self) -> dict[str, str]:
+        """Return the request headers."""
+        # cspell:ignore authtoken
+        return {"authtoken": self._token, "Accept-Encoding": _ACCEPT_ENCODING}
+
+    async def _get_json(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        params: dict[str, Any],
+    ) -> dict[str, Any]:
+        """GET an API endpoint and return the decoded JSON object."""
+        sample = self._sample
+
+        async with async_timeout.timeout(self._timeout):
+            start = time.perf_counter()
+            async with session.get(
+                url, params=params, headers=self._headers()
+            ) as response:
+                # The headers arrived, the body is still on the wire
+                received = time.perf_counter()
+                await _raise_for_status(response)
+                body = await response.read()
+                downloaded = time.perf_counter()
+                # HA's json_loads is backed by orjson
+                data = await response.json(loads=json_loads)
+                decoded = time.perf_counter()
+
+        sample.request += received - start
+        sample.download += downloaded - received
+        sample.decode += decoded - downloaded
+        sample.requests += 1
+        sample.bytes += len(body)
+        # Ensure we return the expected type
+        return data if isinstance(data, dict) else {}
+
     async def _fetch_records(
         self,
         session: aiohttp.ClientSession,
         start: datetime,
         end: datetime,
-    ) -> list[dict[str, Any]]:
-        """Fetch records for a given time range."""
+        store: RecordStore,
+    ) -> int:
+        """Fetch the records of a time range into store; return their count.
+
+        Ranges longer than FETCH_CHUNK are split into windows that are
+        fetched concurrently and retried one by one, so a slow or failed
+        window does not restart the whole range. Records spanning two
+        windows are returned twice and merged by key in the store.
+        """
+        chunks = _time_chunks(
+            _utc_ts(start), _utc_ts(end), int(FETCH_CHUNK.total_seconds())
+        )
+        if len(chunks) == 1:
+            # A failed poll is retried by the next refresh
+            return await self._stream_records(session, *chunks[0], store)
+
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+        async def fetch_chunk(chunk_start: int, chunk_end: int) -> int:
+            async with semaphore:
+                return await self._fetch_chunk(session, chunk_start, chunk_end, store)
+
+        tasks = [asyncio.create_task(fetch_chunk(*chunk)) for chunk in chunks]
+        try:
+            counts = await asyncio.gather(*tasks)
+        except BaseException:
+            # Do not leave the other windows downloading in the background
+            for task in tasks:
+                task.cancel()
+            raise
+        return sum(counts)
+
+    async def _fetch_chunk(
+        self,
+        session: aiohttp.ClientSession,
+        start: int,
+        end: int,
+        store: RecordStore,
+    ) -> int:
+        """Fetch one window of a long range, retrying transient errors."""
+        for attempt in range(FETCH_RETRIES):
+            try:
+                return await self._stream_records(session, start, end, store)
+            except (TimeoutError, aiohttp.ClientError, UpdateFailed) as err:
+                _LOGGER.debug(
+                    "Fetching TimeTagger records %s-%s failed, retrying: %s",
+                    start,
+                    end,
+                    err,
+                )
+            # Records applied before the error are upserted again
+            await asyncio.sleep(
+                backoff_delay(attempt, FETCH_RETRY_DELAY, FETCH_RETRY_DELAY * 8)
+            )
+        return await self._stream_records(session, start, end, store)
+
+    async def _stream_records(
+        self,
+        session: aiohttp.ClientSession,
+        start: int,
+        end: int,
+        store: RecordStore,
+    ) -> int:
+        """Stream the records of one request into store; return their count.
+
+        The body is decoded chunk by chunk and every record is converted
+        right away, so the whole response is never held in memory.
+        """
+        # Running records are included so active timers are detected.
+        # The server filters by the tags all groups of the store require,
+        # the groups are split locally.
         params = {
-            "running": "false",
             "hidden": "false",
-            "tag": self._work_tags,
+            "tag": store.query_tags,
             # cspell:ignore timerange
-            "timerange": f"{_utc_ts(start)}-{_utc_ts(end)}",
+            "timerange": f"{start}-{end}",
         }
-        # cspell:ignore authtoken
-        headers = {"authtoken": self._token}
+        sample = self._sample
+        decoder = RecordStreamDecoder(json_loads)
+        count = 0
+        decode = 0.0
 
-        async with async_timeout.timeout(30):
+        async with async_timeout.timeout(self._timeout):
+            request_start = time.perf_counter()
             async with session.get(
-                self._api_url,
-                params=params,
-                headers=headers
+                self._api_url, params=params, headers=self._headers()
             ) as response:
-                if response.status != 200:
-                    body = await response.text()
-                    raise UpdateFailed(
-                        f"TimeTagger API error: {response.status} - {body}"
-                    )
-                data = await response.json()
-                records = data.get("records", [])
-                # Ensure we return the expected type
-                return records if isinstance(records, list) else []
-
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Fetch data from TimeTagger API."""
+                received = time.perf_counter()
+                await _raise_for_status(response)
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    decode_start = time.perf_counter()
+                    if records := decoder.feed(chunk):
+                        store.apply(records)
+                        count += len(records)
+                    decode += time.perf_counter() - decode_start
+                    sample.bytes += len(chunk)
+                finished = time.perf_counter()
+
+        if not decoder.done:
+            raise UpdateFailed("TimeTagger API error: incomplete records response")
+        sample.request += received - request_start
+        sample.download += finished - received - decode
+        sample.decode += decode
+        sample.requests += 1
+        return count
+
+    async def _fetch_updates(
+        self,
+        session: aiohttp.ClientSession,
+        since: float,
+    ) -> dict[str, Any]:
+        """Fetch the records modified on the server after since."""
+        return await self._get_json(session, self._updates_url, {"since": since})
+
+    async def _sync_records(
+        self,
+        session: aiohttp.ClientSession,
+        window_start: datetime,
+        now: datetime,
+    ) -> bool:
+        """Bring the local record store up to date; return True on changes."""
+        start = float(_utc_ts(window_start))
+        store = self._store
+
+        if store.covers(start):
+            updates = await self._feed.async_fetch(
+                self, partial(self._fetch_updates, session)
+            )
+            if not updates.get("reset"):
+                records = updates.get("records") or []
+                self._sample.records += len(records)
+                if not self._applies_in_executor(records, start):
+                    return self._apply_updates(updates, start)
+                return await self._async_apply_large_updates(updates, start)
+            _LOGGER.debug("TimeTagger requested a reset, reseeding records")
+
+        # Take the cursor before seeding, edits made in between are
+        # picked up again by the next delta sync.
+        cursor = await self._fetch_updates(session, now.timestamp())
+        server_time = float(cursor.get("server_time") or now.timestamp())
+        # Seed a new store and only swap it in once the window is complete
+        seeded = self._new_store()
+        seeded.reset((), server_time, start)
+        count = await self._fetch_records(session, window_start, now, seeded)
+        self._sample.records += count
+        if count >= EXECUTOR_THRESHOLD:
+            await self.hass.async_add_executor_job(seeded.prepare)
+        self._store = seeded
+        self._schedule_cache_save()
+        return True
+
+    @property
+    def updates_cursor(self) -> float | None:
+        """Return the server time the store is synced to, None if unseeded."""
+        return self._store.server_time
+
+    def _applies_in_executor(self, records: list[Any], start: float) -> bool:
+        """Return True if applying the records may rebuild large indexes."""
+        if len(records) >= EXECUTOR_THRESHOLD:
+            return True
+        # A single change or a moved window start drops all indexes
+        return len(self._store) >= EXECUTOR_THRESHOLD and (
+            bool(records) or self._store.start != start
+        )
+
+    def _apply_updates(self, updates: dict[str, Any], start: float) -> bool:
+        """Apply an updates response to the store; return True on changes."""
+        # An unchanged store keeps the cached cursor valid
+        if changed := _apply_to(self._store, updates, start):
+            self._schedule_cache_save()
+        return changed > 0
+
+    async def _async_apply_large_updates(
+        self, updates: dict[str, Any], start: float
+    ) -> bool:
+        """Apply updates to a large store in the executor; True on changes.
+
+        The changes go to a copy of the store that is swapped in when it
+        is ready, the event loop keeps reading the current store meanwhile.
+        """
+        store = self._store.copy()
+        changed = await self.hass.async_add_executor_job(
+            _apply_prepared, store, updates, start
+        )
+        self._store = store
+        if changed:
+            self._schedule_cache_save()
+        return changed > 0
+
+    @callback
+    def async_apply_updates(self, updates: dict[str, Any]) -> None:
+        """Apply the updates fetched by another entry of the same account."""
         now = datetime.now(timezone.utc)
+        start = self._periods_at(now).window_start.timestamp()
+        if updates.get("reset") or not self._store.covers(start):
+            # Reseeded by the next own refresh
+            return
+        if self._applies_in_executor(updates.get("records") or [], start):
+            self.hass.async_create_task(
+                self._async_apply_shared_updates(updates, now, start)
+            )
+            return
+        self._async_shared_updates_applied(
+            now, start, self._apply_updates(updates, start)
+        )
+
+    async def _async_apply_shared_updates(
+        self, updates: dict[str, Any], now: datetime, start: float
+    ) -> None:
+        """Apply the updates of another entry to a large store."""
+        changed = await self._async_apply_large_updates(updates, start)
+        self._async_shared_updates_applied(now, start, changed)
+
+    @callback
+    def _async_shared_updates_applied(
+        self, now: datetime, start: float, changed: bool
+    ) -> None:
+        """Publish the updates fetched by another entry."""
+        # The server answered, this entry may poll again as well
+        self._breaker.record_success()
+        if self._statistics is not None:
+            self.hass.async_create_task(
+                self._statistics.async_update(
+                    self._store.index(), start, now.timestamp(), changed
+                )
+            )
+        self._schedule_polls(now, changed)
+        # Also postpones the own poll while the other entry keeps polling
+        self.async_set_updated_data(self._aggregate(now))
 
-        start_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    async def _fetch_history(self, start: float, end: float) -> IntervalIndex:
+        """Fetch the records of a past time range into a throwaway store."""
+        store = RecordStore(self._work_tags)
+        store.reset((), 0.0, start)
+        count = await self._fetch_records(
+            self._session,
+            datetime.fromtimestamp(start, timezone.utc),
+            datetime.fromtimestamp(end, timezone.utc),
+            store,
+        )
+        if count >= EXECUTOR_THRESHOLD:
+            await self.hass.async_add_executor_job(store.prepare)
+        return store.index()
+
+    async def async_backfill_statistics(self) -> None:
+        """Import the worked hours before the synced window into statistics."""
+        if self._statistics is None:
+            return
+        window_start = self._periods_at(datetime.now(timezone.utc)).window_start
+        try:
+            await self._statistics.async_backfill(
+                self._fetch_history, window_start.timestamp()
+            )
+        except (TimeoutError, aiohttp.ClientError, UpdateFailed) as err:
+            # The next setup resumes after the last imported hour
+            _LOGGER.warning("Backfilling TimeTagger statistics failed: %s", err)
+            return
+        await self._statistics.async_update(
+            self._store.index(),
+            window_start.timestamp(),
+            datetime.now(timezone.utc).timestamp(),
+            True,
+        )
+
+    def _schedule_cache_save(self) -> None:
+        """Write the record store to disk after a debounce delay."""
+        if self._cache is not None:
+            self._cache.async_delay_save(self._store.as_dict, CACHE_SAVE_DELAY)
+
+    async def async_load_cache(self) -> bool:
+        """Load the cached records; return True if data could be published."""
+        if self._cache is None:
+            return False
+        if not (cached := await self._cache.async_load()):
+            return False
+        store = self._new_store()
+        records = cached.get("records")
+        if isinstance(records, list) and len(records) >= EXECUTOR_THRESHOLD:
+            restored = await self.hass.async_add_executor_job(
+                _restore_prepared, store, cached
+            )
+        else:
+            restored = store.restore(cached)
+        if not restored:
+            return False
+        self._store = store
+        self.data = self._aggregate(datetime.now(timezone.utc))
+        self._update_tick()
+        return True
+
+    def hours_between(self, start: datetime, end: datetime) -> float:
+        """Return the hours worked between start and end without an API call."""
+        now = datetime.now(timezone.utc).timestamp()
+        return self._store.hours_between(start.timestamp(), end.timestamp(), now)
+
+    def _schedule_polls(self, now: datetime, changed: bool) -> None:
+        """Adapt the poll interval and the local tick after a sync."""
+        self._idle_polls = 0 if changed else self._idle_polls + 1
+        local = dt_util.as_local(now)
+        self.update_interval = _poll_interval(
+            local,
+            bool(self._store.running),
+            self._idle_polls,
+            self._working_hours,
+            # Days without a target, e.g. weekends, holidays and vacation
+            self.calendar.day_target(local.date()) > 0,
+        )
+        self._update_tick()
+
+    def _update_tick(self) -> None:
+        """Tick the totals locally only while a timer is running."""
+        if self._store.running and self._unsub_tick is None:
+            self._unsub_tick = async_track_time_interval(
+                self.hass, self._async_tick, TICK_INTERVAL
+            )
+        elif not self._store.running and self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+
+    @callback
+    def _async_tick(self, now: datetime) -> None:
+        """Advance the totals of the running timers without polling."""
+        self._async_publish(self._aggregate(now))
+
+    @callback
+    def _async_publish(self, data: TimeTaggerData) -> None:
+        """Hand locally computed totals to the listeners if they changed."""
+        if data == self.data:
+            return
+        self.data = data
+        self.async_update_listeners()
+
+    @callback
+    def async_add_metrics_listener(
+        self, update_callback: CALLBACK_TYPE
+    ) -> CALLBACK_TYPE:
+        """Listen for the metrics of every refresh; return the remover."""
+        self._metrics_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._metrics_listeners.remove(update_callback)
+
+        return remove_listener
 
-        weekday = now.weekday()  # Monday = 0
-        start_week = (now - timedelta(days=weekday)).replace(
-            hour=0, minute=0, second=0, microsecond=0
+    @callback
+    def _async_update_metrics_listeners(self) -> None:
+        """Tell the listeners the refresh metrics changed."""
+        for update_callback in list(self._metrics_listeners):
+            update_callback()
+
+    async def async_shutdown(self) -> None:
+        """Stop the local tick, the shared updates and the scheduled refreshes."""
+        self._unsub_feed()
+        if self._unsub_rollover is not None:
+            self._unsub_rollover()
+            self._unsub_rollover = None
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        await super().async_shutdown()
+
+    def _periods_at(self, now: datetime) -> Periods:
+        """Return the periods of now, computed once per local day."""
+        periods = self._periods
+        if periods is None or not periods.contains(now):
+            periods = self._periods = Periods.at(now)
+            if self._unsub_rollover is not None:
+                self._unsub_rollover()
+            # Today starts from zero even while nothing is polled
+            self._unsub_rollover = async_call_later(
+                self.hass,
+                max(0.0, (periods.next_day - now).total_seconds()),
+                HassJob(
+                    partial(self._async_rollover, periods.next_day),
+                    f"{DOMAIN}_rollover",
+                    cancel_on_shutdown=True,
+                ),
+            )
+        return periods
+
+    @callback
+    def _async_rollover(self, midnight: datetime, now: datetime) -> None:
+        """Publish the totals of the new day at local midnight."""
+        self._unsub_rollover = None
+        if self.data is not None:
+            # The timer may fire a moment early
+            self._async_publish(self._aggregate(max(now, midnight)))
+
+    def _aggregate(self, now: datetime) -> TimeTaggerData:
+        """Sum up the stored records per period."""
+        periods = self._periods_at(now)
+        store = self._store
+        end = now.timestamp()
+        today, week, month = (
+            periods.today.timestamp(),
+            periods.week.timestamp(),
+            periods.month.timestamp(),
         )
 
-        start_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        week_target, month_target = self.calendar.targets(periods.day)
+        return TimeTaggerData(
+            today_hours=store.hours_between(today, end, end),
+            week_hours=store.hours_between(week, end, end),
+            month_hours=store.hours_between(month, end, end),
+            week_target=week_target,
+            month_target=month_target,
+            today_records=store.count_between(today, end),
+            week_records=store.count_between(week, end),
+            month_records=store.count_between(month, end),
+            running=bool(store.running),
+            groups={
+                group: GroupHours(
+                    today=store.hours_between(today, end, end, group),
+                    week=store.hours_between(week, end, end, group),
+                    month=store.hours_between(month, end, end, group),
+                    week_records=store.count_between(week, end, group),
+                )
+                for group in store.groups
+            },
+            tags=self._tag_hours(store, (today, week, month), end),
+        )
+
+    def _tag_hours(
+        self, store: RecordStore, starts: tuple[float, float, float], end: float
+    ) -> dict[str, GroupHours]:
+        """Return the hours per tag of the work records, if enabled."""
+        if not self._tag_breakdown:
+            return {}
+        totals = store.tag_totals(starts, end, end)
+        return {
+            tag: GroupHours(
+                today=today[0], week=week[0], month=month[0], week_records=week[1]
+            )
+            for tag, (today, week, month) in totals.items()
+        }
+
+    async def _async_update_data(self) -> TimeTaggerData:
+        """Fetch data from TimeTagger API."""
+        now = datetime.now(timezone.utc)
+        # The store covers all periods; the buckets are split locally
+        window_start = self._periods_at(now).window_start
+        breaker = self._breaker
+        if not breaker.allow():
+            # Give a struggling server a break; the entities keep the last data
+            self.update_interval = timedelta(seconds=breaker.retry_in)
+            raise UpdateFailed(
+                f"TimeTagger API unavailable, retrying in {breaker.retry_in:.0f} s"
+            )
+
+        self._sample = sample = RefreshSample()
+        start = time.perf_counter()
+        try:
+            changed = await self._sync_records(self._session, window_start, now)
+        except (TimeoutError, aiohttp.ClientError, UpdateFailed) as err:
+            self.metrics.add_error(err)
+            self._async_update_metrics_listeners()
+            # Retry before the next regular poll, backing off while it fails
+            self.update_interval = timedelta(seconds=breaker.record_failure())
+            raise
+        breaker.record_success()
+
+        if self._statistics is not None:
+            await self._statistics.async_update(
+                self._store.index(), window_start.timestamp(), now.timestamp(), changed
+            )
+
+        self._schedule_polls(now, changed)
 
-        async with aiohttp.ClientSession() as session:
-            today = await self._fetch_records(session, start_today, now)
-            week = await self._fetch_records(session, start_week, now)
-            month = await self._fetch_records(session, start_month, now)
+        aggregate_start = time.perf_counter()
+        data = self._aggregate(now)
+        end = time.perf_counter()
+        sample.aggregate = end - aggregate_start
+        sample.total = end - start
+        self.metrics.add(sample)
+        self._async_update_metrics_listeners()
+        return data
 
+    def diagnostics(self) -> dict[str, Any]:
+        """Return the sync state and refresh metrics for the diagnostics."""
+        store = self._store
         return {
-            "today": today,
-            "week": week,
-            "month": month,
+            "records": len(store),
+            "running": len(store.running),
+            "server_time": store.server_time,
+            "window_start": store.start,
+            "idle_polls": self._idle_polls,
+            # Config entries sharing the updates requests, including this one
+            "feed_entries": len(self._feed),
+            "update_interval": str(self.update_interval),
+            "breaker": self._breaker.as_dict(),
+            "metrics": self.metrics.as_dict(),
         }
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    CONF_DAILY_TARGET,
+    CONF_WORK_TAGS,
+    CONF_WORKDAY_END,
+    CONF_WORKDAY_START,
+    DOMAIN,
+)
+from .coordinator import TimeTaggerCoordinator
+
+# Only settings without secrets; the API URL and token are left out
+_CONFIG_KEYS = (CONF_WORK_TAGS, CONF_DAILY_TARGET, CONF_WORKDAY_START, CONF_WORKDAY_END)
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: TimeTaggerCoordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "config": {key: entry.data.get(key) for key in _CONFIG_KEYS},
+        "coordinator": coordinator.diagnostics(),
+    }
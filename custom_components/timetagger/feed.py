@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from .coordinator import TimeTaggerCoordinator
+
+DATA_FEEDS = f"{DOMAIN}_feeds"
+
+
+def _feed_key(api_url: str, token: str) -> tuple[str, str]:
+    """Return the account a config entry polls, matching is_matching."""
+    return api_url.rstrip("/").lower(), token
+
+
+class UpdatesFeed:
+    """Updates stream shared by the config entries of one account.
+
+    The updates API returns every changed record regardless of tags, so
+    one request serves all entries with the same API URL and token; each
+    coordinator filters the records with its own work tags. A request
+    fetches the changes since the oldest cursor of the subscribers and
+    its response is handed to all of them. Refreshes started while a
+    request is in flight wait for its response instead of sending their
+    own.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._subscribers: set[TimeTaggerCoordinator] = set()
+        self._request: asyncio.Task[dict[str, Any]] | None = None
+        # Subscribers awaiting the request in flight apply it themselves
+        self._waiting: set[TimeTaggerCoordinator] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    @callback
+    def async_subscribe(self, coordinator: TimeTaggerCoordinator) -> CALLBACK_TYPE:
+        """Share the updates with a coordinator until unsubscribed."""
+        self._subscribers.add(coordinator)
+
+        @callback
+        def unsubscribe() -> None:
+            self._subscribers.discard(coordinator)
+
+        return unsubscribe
+
+    async def async_fetch(
+        self,
+        coordinator: TimeTaggerCoordinator,
+        fetch: Callable[[float], Awaitable[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        """Return the updates since the oldest cursor of the subscribers."""
+        request = self._request
+        if request is None or request.done():
+            cursors = [
+                cursor
+                for subscriber in (*self._subscribers, coordinator)
+                if (cursor := subscriber.updates_cursor) is not None
+            ]
+            self._waiting = set()
+            request = self._request = self._hass.async_create_task(
+                fetch(min(cursors)), f"{DOMAIN}_updates"
+            )
+            request.add_done_callback(partial(self._async_request_done, self._waiting))
+        self._waiting.add(coordinator)
+        # One cancelled refresh must not cancel the request of the others
+        return await asyncio.shield(request)
+
+    @callback
+    def _async_request_done(
+        self,
+        waiting: set[TimeTaggerCoordinator],
+        request: asyncio.Task[dict[str, Any]],
+    ) -> None:
+        """Hand a response to the subscribers that did not wait for it."""
+        if self._request is request:
+            self._request = None
+        if request.cancelled() or request.exception() is not None:
+            return
+        updates = request.result()
+        for subscriber in self._subscribers - waiting:
+            subscriber.async_apply_updates(updates)
+
+
+@callback
+def async_get_feed(hass: HomeAssistant, api_url: str, token: str) -> UpdatesFeed:
+    """Return the updates feed of an account, creating it on first use."""
+    feeds: dict[tuple[str, str], UpdatesFeed] = hass.data.setdefault(DATA_FEEDS, {})
+    key = _feed_key(api_url, token)
+    if (feed := feeds.get(key)) is None:
+        feed = feeds[key] = UpdatesFeed(hass)
+    return feed
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .const import METRICS_WINDOW
+
+_PERCENTILES = {"p50": 0.5, "p95": 0.95}
+
+
+@dataclass(slots=True)
+class RefreshSample:
+    """Timings and sizes of one refresh; durations are in seconds."""
+
+    # Time until the response headers arrived, i.e. connect plus TTFB
+    request: float = 0.0
+    download: float = 0.0
+    decode: float = 0.0
+    aggregate: float = 0.0
+    total: float = 0.0
+    requests: int = 0
+    bytes: int = 0
+    records: int = 0
+
+
+_TIMINGS = ("request", "download", "decode", "aggregate", "total")
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of sorted values."""
+    rank = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[rank]
+
+
+class FetchMetrics:
+    """Rolling timings, sizes and error counters of the refreshes."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        self.samples: deque[RefreshSample] = deque(maxlen=window)
+        self.refreshes = 0
+        self.errors: Counter[str] = Counter()
+        self.total_requests = 0
+        self.total_bytes = 0
+
+    @property
+    def last(self) -> RefreshSample | None:
+        """Return the latest successful refresh."""
+        return self.samples[-1] if self.samples else None
+
+    def add(self, sample: RefreshSample) -> None:
+        """Record a successful refresh."""
+        self.samples.append(sample)
+        self.refreshes += 1
+        self.total_requests += sample.requests
+        self.total_bytes += sample.bytes
+
+    def add_error(self, error: BaseException) -> None:
+        """Count a failed refresh by error type."""
+        self.errors[type(error).__name__] += 1
+
+    def percentiles(self) -> dict[str, dict[str, float]]:
+        """Return p50, p95 and max of every timing over the window."""
+        if not self.samples:
+            return {}
+        result = {}
+        for name in _TIMINGS:
+            values = sorted(getattr(sample, name) for sample in self.samples)
+            result[name] = {
+                key: round(_percentile(values, fraction), 4)
+                for key, fraction in _PERCENTILES.items()
+            }
+            result[name]["max"] = round(values[-1], 4)
+        return result
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics for the diagnostics."""
+        last = self.last
+        return {
+            "refreshes": self.refreshes,
+            "errors": dict(self.errors),
+            "total_requests": self.total_requests,
+            "total_bytes": self.total_bytes,
+            "last": asdict(last) if last is not None else None,
+            "percentiles": self.percentiles(),
+            "window": len(self.samples),
+        }
@@ -0,0 +1,652 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+import codecs
+from collections.abc import Callable, Iterable, Mapping, Sequence
+import copy
+from dataclasses import dataclass
+import heapq
+import json
+import re
+import sys
+from operator import itemgetter
+from typing import Any
+
+# cspell:ignore HIDDEN
+_HIDDEN_PREFIX = "HIDDEN"
+_TAG_RE = re.compile(r"#[^\s#,]+")
+# Above this many changed records a full re-sort beats sorted inserts
+_INCREMENTAL_LIMIT = 64
+
+# (t1, t2, key) of a record, ordered by start time
+_Entry = tuple[float, float, str]
+
+
+# Canonical instance of every tag set, shared by all records carrying it
+_TAG_SETS: dict[frozenset[str], frozenset[str]] = {}
+
+
+def _parse_tags(value: str) -> frozenset[str]:
+    """Return the lower-cased tags of a description or tag list."""
+    return frozenset(tag.lower() for tag in _TAG_RE.findall(value or ""))
+
+
+def _intern_tags(value: str) -> frozenset[str]:
+    """Return the shared, interned tag set of a description."""
+    tags = _parse_tags(value)
+    if (interned := _TAG_SETS.get(tags)) is None:
+        interned = frozenset(sys.intern(tag) for tag in tags)
+        _TAG_SETS[interned] = interned
+    return interned
+
+
+@dataclass(frozen=True, slots=True)
+class Record:
+    """Compact TimeTagger record, converted once when it is ingested."""
+
+    key: str
+    t1: float
+    t2: float
+    mt: float
+    tags: frozenset[str]
+
+    @classmethod
+    def from_api(cls, data: dict[str, Any]) -> Record:
+        """Convert a record dict from the API."""
+        return cls(
+            key=str(data["key"]),
+            t1=float(data.get("t1") or 0),
+            t2=float(data.get("t2") or 0),
+            mt=float(data.get("mt") or 0),
+            tags=_intern_tags(data.get("ds") or ""),
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the record in API form, keeping only the tags of ds."""
+        return {
+            "key": self.key,
+            "t1": self.t1,
+            "t2": self.t2,
+            "mt": self.mt,
+            "ds": " ".join(sorted(self.tags)),
+        }
+
+
+def _entry(record: Record) -> _Entry:
+    """Return the sort entry of a record."""
+    return (record.t1, record.t2, record.key)
+
+
+@dataclass(frozen=True, slots=True)
+class TagFilter:
+    """Tag condition of a group of records.
+
+    A record matches if it carries all tags of all_of, at least one tag
+    of every set in any_of and none of the tags in exclude.
+    """
+
+    all_of: frozenset[str] = frozenset()
+    any_of: tuple[frozenset[str], ...] = ()
+    exclude: frozenset[str] = frozenset()
+
+    @classmethod
+    def parse(cls, expression: str) -> TagFilter:
+        """Parse a filter like "#work #a|#b -#private"; raise ValueError."""
+        all_of: set[str] = set()
+        any_of: list[frozenset[str]] = []
+        exclude: set[str] = set()
+        for token in re.split(r"[\s,]+", expression.strip()):
+            if not token:
+                continue
+            negated = token.startswith("-")
+            tags = (token[1:] if negated else token).split("|")
+            if not all(_TAG_RE.fullmatch(tag) for tag in tags):
+                raise ValueError(f"Invalid tag filter term: {token}")
+            parsed = frozenset(tag.lower() for tag in tags)
+            if negated:
+                exclude |= parsed
+            elif len(parsed) > 1:
+                any_of.append(parsed)
+            else:
+                all_of |= parsed
+        return cls(frozenset(all_of), tuple(any_of), frozenset(exclude))
+
+    def matches(self, tags: frozenset[str]) -> bool:
+        """Return True if a record with these tags belongs to the group."""
+        return (
+            self.all_of <= tags
+            and self.exclude.isdisjoint(tags)
+            and all(not tags.isdisjoint(one_of) for one_of in self.any_of)
+        )
+
+    def __str__(self) -> str:
+        terms = sorted(self.all_of)
+        terms += sorted("|".join(sorted(one_of)) for one_of in self.any_of)
+        terms += sorted(f"-{tag}" for tag in self.exclude)
+        return " ".join(terms)
+
+
+def parse_tag_groups(value: str) -> dict[str, TagFilter]:
+    """Parse "Name: filter; Other: filter" into tag filters by group name.
+
+    Raises ValueError for a missing or duplicate name or an invalid filter.
+    """
+    groups: dict[str, TagFilter] = {}
+    for definition in (value or "").split(";"):
+        if not definition.strip():
+            continue
+        name, separator, expression = definition.partition(":")
+        name = name.strip()
+        if not separator or not name or name in groups:
+            raise ValueError(f"Invalid tag group: {definition.strip()}")
+        groups[name] = TagFilter.parse(expression)
+    return groups
+
+
+class TagGroups:
+    """Tag filters evaluated together, once per distinct tag set.
+
+    Records share interned tag sets, so a store holds only a few distinct
+    sets. Each is matched against all filters once; after that a record
+    costs a single dict lookup, however many groups there are.
+    """
+
+    def __init__(self, filters: Sequence[TagFilter]) -> None:
+        self.filters = tuple(filters)
+        self._matches: dict[frozenset[str], tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+    def matches(self, tags: frozenset[str]) -> tuple[int, ...]:
+        """Return the positions of the filters matching a tag set."""
+        if (found := self._matches.get(tags)) is None:
+            found = tuple(
+                i
+                for i, tag_filter in enumerate(self.filters)
+                if tag_filter.matches(tags)
+            )
+            self._matches[tags] = found
+        return found
+
+    @property
+    def required(self) -> frozenset[str]:
+        """Return the tags every filter requires, usable as a server filter."""
+        return frozenset.intersection(*(f.all_of for f in self.filters))
+
+    def indexes(self, records: Iterable[Record]) -> list[IntervalIndex]:
+        """Return the interval index of every filter in one pass.
+
+        The records must be passed sorted by start.
+        """
+        intervals: list[list[tuple[float, float]]] = [[] for _ in self.filters]
+        for record in records:
+            for i in self.matches(record.tags):
+                intervals[i].append((record.t1, record.t2))
+        return [IntervalIndex(group) for group in intervals]
+
+
+class IntervalIndex:
+    """Sorted, merged time intervals with cumulative durations.
+
+    The intervals must be passed sorted by start. Overlapping intervals,
+    e.g. from timers running on two devices, are merged in one linear
+    sweep so they are only counted once. The worked time between any two
+    timestamps is then answered with two binary searches in O(log n).
+    """
+
+    def __init__(self, intervals: Iterable[tuple[float, float]]) -> None:
+        self._starts = array("d")
+        self._ends = array("d")
+        # _prefix[i] is the total duration of the first i intervals
+        self._prefix = array("d", [0.0])
+        for t1, t2 in intervals:
+            if t2 <= t1:
+                continue
+            if self._ends and t1 <= self._ends[-1]:
+                if t2 > self._ends[-1]:
+                    self._prefix[-1] += t2 - self._ends[-1]
+                    self._ends[-1] = t2
+                continue
+            self._starts.append(t1)
+            self._ends.append(t2)
+            self._prefix.append(self._prefix[-1] + t2 - t1)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def seconds_between(self, start: float, end: float) -> float:
+        """Return the covered seconds between start and end."""
+        if end <= start:
+            return 0.0
+        first = bisect_right(self._ends, start)
+        last = bisect_left(self._starts, end)
+        if first >= last:
+            return 0.0
+        total = self._prefix[last] - self._prefix[first]
+        # Cut off the parts of the outer intervals outside the range
+        total -= max(0.0, start - self._starts[first])
+        total -= max(0.0, self._ends[last - 1] - end)
+        return total
+
+    def hours_between(self, start: float, end: float) -> float:
+        """Return the covered hours between start and end."""
+        return round(self.seconds_between(start, end) / 3600.0, 2)
+
+
+class RecordStore:
+    """Local copy of the TimeTagger records, keyed by record key.
+
+    The store is seeded once from the records API and then kept in sync
+    with the deltas returned by the updates API. Records are filtered
+    locally the same way the server filters the records API: hidden
+    records are dropped and a record must carry all work tags. Records
+    that ended before the window start are not kept. Running records,
+    which have t1 == t2, are tracked separately from the finished ones.
+
+    With tag groups, the records of every group are kept as well and the
+    totals of the work tags and of each group are queried by group name.
+    """
+
+    def __init__(
+        self,
+        work_tags: str,
+        groups: Mapping[str, TagFilter] | None = None,
+    ) -> None:
+        self._tags = _parse_tags(work_tags)
+        groups = groups or {}
+        # The work tags are filter 0, the named groups follow in order
+        self._groups = TagGroups((TagFilter(self._tags), *groups.values()))
+        self._group_ids = {name: i for i, name in enumerate(groups, 1)}
+        self._records: dict[str, Record] = {}
+        self._running: dict[str, Record] = {}
+        # None after bulk changes, sorted again when next needed
+        self._sorted: list[_Entry] | None = []
+        self._indexes: list[IntervalIndex] | None = None
+        self.server_time: float | None = None
+        self.start: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def running(self) -> list[Record]:
+        """Return the records with a running timer."""
+        return list(self._running.values())
+
+    @property
+    def groups(self) -> list[str]:
+        """Return the names of the tag groups."""
+        return list(self._group_ids)
+
+    @property
+    def query_tags(self) -> str:
+        """Return the tags the records API can filter by for this store."""
+        return ",".join(sorted(self._groups.required))
+
+    def _group_id(self, group: str | None) -> int:
+        """Return the filter position of a group, 0 for the work tags."""
+        return 0 if group is None else self._group_ids[group]
+
+    def covers(self, start: float) -> bool:
+        """Return True if the store is seeded for a window beginning at start."""
+        return (
+            self.server_time is not None
+            and self.start is not None
+            and start >= self.start
+        )
+
+    def _ingest(self, data: dict[str, Any]) -> Record | None:
+        """Convert an API record; return None if it does not belong in the store."""
+        if (data.get("ds") or "").startswith(_HIDDEN_PREFIX):
+            return None
+        record = Record.from_api(data)
+        running = record.t1 == record.t2
+        if not running and self.start is not None and record.t2 <= self.start:
+            return None
+        return record if self._groups.matches(record.tags) else None
+
+    def reset(
+        self,
+        records: Iterable[dict[str, Any]],
+        server_time: float,
+        start: float,
+    ) -> None:
+        """Replace the store content with a freshly fetched window.
+
+        Further batches of the window can be added with apply, the entries
+        are sorted once when they are first needed.
+        """
+        self._records.clear()
+        self._running.clear()
+        self._sorted = None
+        self._indexes = None
+        self.server_time = server_time
+        self.start = start
+        self.apply(records)
+
+    def apply(self, records: Iterable[dict[str, Any]]) -> int:
+        """Apply inserted, edited and deleted records; return the change count."""
+        changed = 0
+        # Sort entry of every touched record before this batch
+        touched: dict[str, _Entry | None] = {}
+        for data in records:
+            if not (key := data.get("key")):
+                continue
+            current = self._records.get(key)
+            latest = current or self._running.get(key)
+            if latest is not None and latest.mt > float(data.get("mt") or 0):
+                # Stale edit, the store already has a newer version
+                continue
+            record = self._ingest(data)
+            if record is not None and record == latest:
+                # Already applied, e.g. from an overlapping updates response
+                continue
+            running_changed = self._running.pop(key, None) is not None
+            if record is not None and record.t1 == record.t2:
+                self._running[key] = record
+                record = None
+                running_changed = True
+            if record is not None:
+                self._records[key] = record
+            elif self._records.pop(key, None) is None:
+                # Neither before nor after a finished record
+                if running_changed:
+                    changed += 1
+                continue
+            changed += 1
+            if key not in touched:
+                touched[key] = _entry(current) if current is not None else None
+        if touched:
+            self._update_sorted(touched)
+        return changed
+
+    def _entries(self) -> list[_Entry]:
+        """Return the sorted entries, sorting them after bulk changes."""
+        if self._sorted is None:
+            self._sorted = sorted(_entry(r) for r in self._records.values())
+        return self._sorted
+
+    def _update_sorted(self, touched: dict[str, _Entry | None]) -> None:
+        """Update the sorted entries of the touched records."""
+        if self._sorted is None or len(touched) > _INCREMENTAL_LIMIT:
+            # Sorted in one go when next needed
+            self._sorted = None
+            self._indexes = None
+            return
+        if len(self._groups) > 1:
+            # Edited tags can move a record between the group indexes
+            self._indexes = None
+        for key, old in touched.items():
+            record = self._records.get(key)
+            if (new := _entry(record) if record is not None else None) == old:
+                continue
+            if old is not None:
+                pos = bisect_left(self._sorted, old)
+                if pos < len(self._sorted) and self._sorted[pos] == old:
+                    del self._sorted[pos]
+            if new is not None:
+                insort(self._sorted, new)
+            self._indexes = None
+
+    def prune(self, start: float) -> int:
+        """Move the window start forward; return the number of dropped records."""
+        if start == self.start:
+            return 0
+        self.start = start
+        entries = self._entries()
+        count = len(entries)
+        self._sorted = [e for e in entries if e[1] > start]
+        if len(self._sorted) == count:
+            return 0
+        keep = {e[2] for e in self._sorted}
+        self._records = {key: r for key, r in self._records.items() if key in keep}
+        self._indexes = None
+        return count - len(self._sorted)
+
+    def records(self) -> list[Record]:
+        """Return the stored records ordered by start time."""
+        return [self._records[key] for _, _, key in self._entries()]
+
+    def count_between(self, start: float, end: float, group: str | None = None) -> int:
+        """Return the number of records of a group overlapping start..end.
+
+        Without a group name the records with the work tags are counted.
+        """
+        entries = self._entries()
+        last = bisect_left(entries, (end,))
+        if len(self._groups) == 1:
+            # Every stored record carries the work tags
+            return sum(1 for e in entries[:last] if e[1] > start)
+        group_id = self._group_id(group)
+        matches = self._groups.matches
+        records = self._records
+        return sum(
+            1
+            for e in entries[:last]
+            if e[1] > start and group_id in matches(records[e[2]].tags)
+        )
+
+    def hours_between(
+        self,
+        start: float,
+        end: float,
+        now: float | None = None,
+        group: str | None = None,
+    ) -> float:
+        """Return the worked hours of a group between start and end.
+
+        With now given, running timers count as worked up to now. Without
+        a group name the hours of the work tags are returned.
+        """
+        group_id = self._group_id(group)
+        index = self.index(group)
+        total = index.seconds_between(start, end)
+        running = [
+            r.t1
+            for r in self._running.values()
+            if group_id in self._groups.matches(r.tags)
+        ]
+        if now is not None and running:
+            # All timers run until now, so together they cover one interval
+            first = max(min(running), start)
+            if (last := min(now, end)) > first:
+                total += last - first - index.seconds_between(first, last)
+        return round(total / 3600.0, 2)
+
+    def tag_totals(
+        self, starts: Sequence[float], end: float, now: float
+    ) -> dict[str, list[tuple[float, int]]]:
+        """Return the hours and record count of every tag since each start.
+
+        The tags of the work records other than the work tags are summed
+        in one pass over the records ordered by start, clipped to every
+        period at once. Overlapping records of a tag are counted once and
+        running timers count as worked up to now.
+        """
+        records = self._records
+        matches = self._groups.matches
+        running = sorted(
+            ((r.t1, now, r) for r in self._running.values()), key=itemgetter(0)
+        )
+        finished = ((t1, t2, records[key]) for t1, t2, key in self._entries())
+        # Tags to break down per distinct tag set
+        extra_tags: dict[frozenset[str], frozenset[str]] = {}
+        # Per tag and start: [seconds, merged start, merged end, records]
+        sweeps: dict[str, list[list[float]]] = {}
+        for t1, t2, record in heapq.merge(finished, running, key=itemgetter(0)):
+            if t1 >= end:
+                break
+            if (tags := extra_tags.get(record.tags)) is None:
+                tags = extra_tags[record.tags] = (
+                    record.tags - self._tags
+                    if 0 in matches(record.tags)
+                    else frozenset()
+                )
+            for tag in tags:
+                if (sweep := sweeps.get(tag)) is None:
+                    sweep = sweeps[tag] = [[0.0, 0.0, 0.0, 0] for _ in starts]
+                for start, state in zip(starts, sweep):
+                    first, last = max(t1, start), min(t2, end)
+                    if last <= first:
+                        continue
+                    state[3] += 1
+                    if first > state[2]:
+                        state[0] += state[2] - state[1]
+                        state[1], state[2] = first, last
+                    elif last > state[2]:
+                        state[2] = last
+        return {
+            tag: [
+                (round((seconds + last - first) / 3600.0, 2), int(count))
+                for seconds, first, last, count in sweep
+            ]
+            for tag, sweep in sorted(sweeps.items())
+        }
+
+    def prepare(self) -> None:
+        """Sort the entries and build the indexes now instead of on first use.
+
+        Meant for a store the event loop does not see yet, so the work can
+        run in the executor before the store is swapped in.
+        """
+        self.index()
+
+    def copy(self) -> RecordStore:
+        """Return a copy that can be changed while this store stays in use."""
+        return copy.copy(self)
+
+    def __copy__(self) -> RecordStore:
+        store = object.__new__(RecordStore)
+        # Built indexes are never changed, only replaced
+        store.__dict__ = {
+            **self.__dict__,
+            "_records": dict(self._records),
+            "_running": dict(self._running),
+            "_sorted": None if self._sorted is None else list(self._sorted),
+        }
+        return store
+
+    def index(self, group: str | None = None) -> IntervalIndex:
+        """Return the interval index of a group, by default the work tags."""
+        if self._indexes is None:
+            if len(self._groups) == 1:
+                # The entries are kept sorted, so this is a single linear pass
+                self._indexes = [
+                    IntervalIndex((t1, t2) for t1, t2, _ in self._entries())
+                ]
+            else:
+                # One pass over the sorted records fills every group
+                self._indexes = self._groups.indexes(self.records())
+        return self._indexes[self._group_id(group)]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the store content for the on-disk cache."""
+        return {
+            "tags": sorted(self._tags),
+            "groups": [str(f) for f in self._groups.filters[1:]],
+            "server_time": self.server_time,
+            "start": self.start,
+            "records": [
+                r.as_dict() for r in (*self._records.values(), *self._running.values())
+            ],
+        }
+
+    def restore(self, data: dict[str, Any]) -> bool:
+        """Restore the store from the on-disk cache; return True on success."""
+        server_time = data.get("server_time")
+        start = data.get("start")
+        records = data.get("records")
+        if server_time is None or start is None or not isinstance(records, list):
+            return False
+        groups = [str(f) for f in self._groups.filters[1:]]
+        if (
+            set(data.get("tags") or []) != self._tags
+            or (data.get("groups") or []) != groups
+        ):
+            # Cached with other tags, the records are filtered differently
+            return False
+        self.reset(records, float(server_time), float(start))
+        return True
+
+
+def _decode_batch(
+    loads: Callable[[str], Any],
+    buffer: str,
+    pos: int,
+    records: list[dict[str, Any]],
+) -> int:
+    """Decode all records up to the last "}" at once; return the new pos."""
+    while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+        pos += 1
+    end = buffer.rfind("}") + 1
+    if end <= pos or buffer[pos] != "{":
+        return pos
+    try:
+        batch = loads("[" + buffer[pos:end] + "]")
+    except ValueError:
+        return pos
+    records.extend(record for record in batch if isinstance(record, dict))
+    return end
+
+
+class RecordStreamDecoder:
+    """Incrementally decode the records array of a records API response.
+
+    Chunks of the response body are fed as they arrive and every record
+    is returned as soon as it is complete, so only the current chunk and
+    one partial record are buffered instead of the whole body.
+
+    With a fast loads function such as orjson.loads, the complete records
+    of a chunk are decoded in one call. A cut that does not fall between
+    two records, e.g. after a "}" inside a description, is not valid JSON
+    and falls back to decoding record by record with the standard library.
+    """
+
+    def __init__(self, loads: Callable[[str], Any] | None = None) -> None:
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._loads = loads
+        self._buffer = ""
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        """Add a chunk of the body; return the records completed by it."""
+        buffer = self._buffer + self._text.decode(chunk)
+        pos = 0
+        if not self._in_array:
+            if (pos := self._find_array(buffer)) < 0:
+                # Keep enough to find a key split across chunks
+                self._buffer = buffer[-32:]
+                return []
+            self._in_array = True
+
+        records: list[dict[str, Any]] = []
+        size = len(buffer)
+        if self._loads is not None:
+            pos = _decode_batch(self._loads, buffer, pos, records)
+        while not self.done:
+            while pos < size and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= size:
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                record, pos = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The record continues in the next chunk
+                break
+            if isinstance(record, dict):
+                records.append(record)
+        self._buffer = buffer[pos:]
+        return records
+
+    @staticmethod
+    def _find_array(buffer: str) -> int:
+        """Return the position after the "[" of the records array or -1."""
+        match = re.search(r'"records"\s*:\s*\[', buffer)
+        return match.end() if match else -1
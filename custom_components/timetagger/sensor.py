@@ -1,29 +1,24 @@
 from __future__ import annotations
 
-from datetime import datetime
 from typing import Any
-from calendar import monthrange
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import slugify
 
-from .const import DOMAIN, CONF_DAILY_TARGET
+from .const import CONF_TAG_BREAKDOWN, DEFAULT_TAG_BREAKDOWN, DOMAIN
 from .coordinator import TimeTaggerCoordinator
 
 
-def _sum_hours(records: list[dict[str, Any]]) -> float:
-    """Sum t2-t1 in hours over all records."""
-    total = 0.0
-    for r in records:
-        t1 = float(r.get("t1", 0))
-        t2 = float(r.get("t2", 0))
-        total += max(0, t2 - t1)
-    return round(total / 3600.0, 2)
-
-
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -31,27 +26,76 @@ async def async_setup_entry(
 ) -> None:
     """Set up TimeTagger sensors from a config entry."""
     coordinator: TimeTaggerCoordinator = hass.data[DOMAIN][entry.entry_id]
-    daily_target = entry.data.get(CONF_DAILY_TARGET, 8.0)
 
     entities: list[SensorEntity] = [
         TTWorkToday(coordinator, entry),
         TTWorkWeek(coordinator, entry),
         TTWorkMonth(coordinator, entry),
-        TTRemainingWeek(coordinator, entry, daily_target),
-        TTMonthlyBalance(coordinator, entry, daily_target),
+        TTRemainingWeek(coordinator, entry),
+        TTMonthlyBalance(coordinator, entry),
+        TTRefreshDuration(coordinator, entry),
     ]
+    entities.extend(
+        TTTagGroupWeek(coordinator, entry, group) for group in coordinator.tag_groups
+    )
 
     async_add_entities(entities)
 
+    if entry.data.get(CONF_TAG_BREAKDOWN, DEFAULT_TAG_BREAKDOWN):
+        _async_track_tags(hass, entry, coordinator, async_add_entities)
+
+
+@callback
+def _async_track_tags(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    coordinator: TimeTaggerCoordinator,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Add a sensor for every tag that appears, remove those that vanish."""
+    sensors: dict[str, TTTagWeek] = {}
+    registry = er.async_get(hass)
+
+    # Tags that vanished while Home Assistant was stopped
+    prefix = f"{entry.entry_id}_timetagger_tag_"
+    current = {f"{prefix}{slugify(tag)}_week" for tag in coordinator.data.tags}
+    for entity_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+        unique_id = entity_entry.unique_id
+        if unique_id.startswith(prefix) and unique_id not in current:
+            registry.async_remove(entity_entry.entity_id)
+
+    @callback
+    def async_update_tags() -> None:
+        tags = coordinator.data.tags
+        for tag in [tag for tag in sensors if tag not in tags]:
+            entity_id = sensors.pop(tag).entity_id
+            if entity_id and registry.async_get(entity_id):
+                registry.async_remove(entity_id)
+        new = [TTTagWeek(coordinator, entry, tag) for tag in tags if tag not in sensors]
+        if new:
+            sensors.update((sensor.tag, sensor) for sensor in new)
+            async_add_entities(new)
+
+    async_update_tags()
+    entry.async_on_unload(coordinator.async_add_listener(async_update_tags))
+
 
 class TTBaseSensor(CoordinatorEntity[TimeTaggerCoordinator], SensorEntity):
-    """Base entity for TimeTagger sensors with common device info."""
+    """Base entity for TimeTagger sensors with common device info.
+
+    Every coordinator update reaches all sensors, but only those whose
+    value, attributes or availability changed write their state. While
+    refreshes fail, the sensors keep the last data, marked as stale.
+    """
 
     _attr_has_entity_name = True
+    _written: tuple[Any, ...] | None = None
 
     def __init__(self, coordinator: TimeTaggerCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator)
         self._entry_id = entry.entry_id
+        # Several accounts can be set up, each with its own sensors
+        self._attr_unique_id = f"{entry.entry_id}_{self._attr_unique_id}"
         self._attr_device_info = {
             "identifiers": {(DOMAIN, self._entry_id)},
             "name": "TimeTagger",
@@ -59,6 +103,39 @@ class TTBaseSensor(CoordinatorEntity[TimeTaggerCoordinator], SensorEntity):
             "model": "API",
         }
 
+    @property
+    def available(self) -> bool:
+        """Stay available with the last data while refreshes fail."""
+        return self.coordinator.data is not None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the attributes of the sensor, marked stale if needed."""
+        attributes = self._attributes()
+        if not self.coordinator.last_update_success:
+            attributes["stale"] = True
+        return attributes or None
+
+    def _attributes(self) -> dict[str, Any]:
+        """Return the attributes of the sensor, none by default."""
+        return {}
+
+    def _state_key(self) -> tuple[Any, ...]:
+        """Return what the written state is made of."""
+        return (self.available, self.native_value, self.extra_state_attributes)
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state and remember what was written."""
+        self._written = self._state_key()
+        super().async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if it differs from the last one written."""
+        if self._state_key() != self._written:
+            self.async_write_ha_state()
+
 
 class TTWorkToday(TTBaseSensor):
     """Working hours today."""
@@ -69,8 +146,7 @@ class TTWorkToday(TTBaseSensor):
 
     @property
     def native_value(self) -> float | None:
-        records = self.coordinator.data.get("today", [])
-        return _sum_hours(records)
+        return self.coordinator.data.today_hours
 
 
 class TTWorkWeek(TTBaseSensor):
@@ -82,8 +158,7 @@ class TTWorkWeek(TTBaseSensor):
 
     @property
     def native_value(self) -> float | None:
-        records = self.coordinator.data.get("week", [])
-        return _sum_hours(records)
+        return self.coordinator.data.week_hours
 
 
 class TTWorkMonth(TTBaseSensor):
@@ -95,8 +170,7 @@ class TTWorkMonth(TTBaseSensor):
 
     @property
     def native_value(self) -> float | None:
-        records = self.coordinator.data.get("month", [])
-        return _sum_hours(records)
+        return self.coordinator.data.month_hours
 
 
 class TTRemainingWeek(TTBaseSensor):
@@ -106,36 +180,16 @@ class TTRemainingWeek(TTBaseSensor):
     _attr_unique_id = "timetagger_remaining_week"
     _attr_native_unit_of_measurement = "h"
 
-    def __init__(
-        self,
-        coordinator: TimeTaggerCoordinator,
-        entry: ConfigEntry,
-        daily_target: float,
-    ) -> None:
-        super().__init__(coordinator, entry)
-        self._daily_target = daily_target
-
-    def _week_target(self) -> float:
-        """Simple week target: weekdays passed * daily_target."""
-        now = datetime.now()
-        weekday = now.weekday()  # 0=Mon
-        effective_days = min(weekday + 1, 5)
-        return round(effective_days * self._daily_target, 2)
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        week_hours = _sum_hours(self.coordinator.data.get("week", []))
-        target = self._week_target()
+    def _attributes(self) -> dict[str, Any]:
+        data = self.coordinator.data
         return {
-            "target_hours": target,
-            "worked_hours": week_hours,
+            "target_hours": data.week_target,
+            "worked_hours": data.week_hours,
         }
 
     @property
     def native_value(self) -> float | None:
-        week_hours = _sum_hours(self.coordinator.data.get("week", []))
-        target = self._week_target()
-        return round(target - week_hours, 2)
+        return self.coordinator.data.week_remaining
 
 
 class TTMonthlyBalance(TTBaseSensor):
@@ -145,40 +199,110 @@ class TTMonthlyBalance(TTBaseSensor):
     _attr_unique_id = "timetagger_monthly_balance"
     _attr_native_unit_of_measurement = "h"
 
+    def _attributes(self) -> dict[str, Any]:
+        data = self.coordinator.data
+        return {
+            "worked_hours": data.month_hours,
+            "target_hours": data.month_target,
+        }
+
+    @property
+    def native_value(self) -> float | None:
+        return self.coordinator.data.month_balance
+
+
+class TTTagGroupWeek(TTBaseSensor):
+    """Hours of a tag group this week, split locally from the same records."""
+
+    _attr_native_unit_of_measurement = "h"
+
     def __init__(
-        self,
-        coordinator: TimeTaggerCoordinator,
-        entry: ConfigEntry,
-        daily_target: float,
+        self, coordinator: TimeTaggerCoordinator, entry: ConfigEntry, group: str
     ) -> None:
         super().__init__(coordinator, entry)
-        self._daily_target = daily_target
+        self._group = group
+        self._attr_name = f"{group} this week"
+        self._attr_unique_id = (
+            f"{entry.entry_id}_timetagger_group_{slugify(group)}_week"
+        )
+
+    def _attributes(self) -> dict[str, Any]:
+        attributes: dict[str, Any] = {
+            "tag_filter": str(self.coordinator.tag_groups[self._group])
+        }
+        if (hours := self.coordinator.data.groups.get(self._group)) is not None:
+            attributes["today_hours"] = hours.today
+            attributes["month_hours"] = hours.month
+            attributes["week_records"] = hours.week_records
+        return attributes
+
+    @property
+    def native_value(self) -> float | None:
+        hours = self.coordinator.data.groups.get(self._group)
+        return hours.week if hours is not None else None
 
-    def _monthly_target(self) -> float:
-        """Compute target hours for the month up to today (Mon–Fri)."""
-        now = datetime.now()
-        year, month, today = now.year, now.month, now.day
-        _, _days_in_month = monthrange(year, month)
 
-        workdays_passed = 0
-        for day in range(1, today + 1):
-            dt = datetime(year, month, day)
-            if dt.weekday() < 5:
-                workdays_passed += 1
+class TTTagWeek(TTBaseSensor):
+    """Hours of one tag this week, added while the tag is in use."""
 
-        return round(workdays_passed * self._daily_target, 2)
+    _attr_native_unit_of_measurement = "h"
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        month_hours = _sum_hours(self.coordinator.data.get("month", []))
-        target = self._monthly_target()
+    def __init__(
+        self, coordinator: TimeTaggerCoordinator, entry: ConfigEntry, tag: str
+    ) -> None:
+        super().__init__(coordinator, entry)
+        self.tag = tag
+        self._attr_name = f"{tag} this week"
+        self._attr_unique_id = f"{entry.entry_id}_timetagger_tag_{slugify(tag)}_week"
+
+    def _attributes(self) -> dict[str, Any]:
+        if (hours := self.coordinator.data.tags.get(self.tag)) is None:
+            return {}
         return {
-            "worked_hours": month_hours,
-            "target_hours": target,
+            "today_hours": hours.today,
+            "month_hours": hours.month,
+            "week_records": hours.week_records,
+        }
+
+    @property
+    def native_value(self) -> float | None:
+        hours = self.coordinator.data.tags.get(self.tag)
+        return hours.week if hours is not None else None
+
+
+class TTRefreshDuration(TTBaseSensor):
+    """Duration of the last refresh with rolling percentiles (diagnostic)."""
+
+    _attr_name = "Refresh duration"
+    _attr_unique_id = "timetagger_refresh_duration"
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    async def async_added_to_hass(self) -> None:
+        """Also update after refreshes that did not change the totals."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_metrics_listener(self._handle_coordinator_update)
+        )
+
+    def _attributes(self) -> dict[str, Any]:
+        metrics = self.coordinator.metrics
+        attributes: dict[str, Any] = {
+            f"{timing}_{key}": value
+            for timing, stats in metrics.percentiles().items()
+            for key, value in stats.items()
         }
+        if (last := metrics.last) is not None:
+            attributes["last_requests"] = last.requests
+            attributes["last_bytes"] = last.bytes
+            attributes["last_records"] = last.records
+        attributes["errors"] = sum(metrics.errors.values())
+        return attributes
 
     @property
     def native_value(self) -> float | None:
-        month_hours = _sum_hours(self.coordinator.data.get("month", []))
-        target = self._monthly_target()
-        return round(month_hours - target, 2)
+        last = self.coordinator.metrics.last
+        return round(last.total, 3) if last is not None else None
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+import logging
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+    statistics_during_period,
+)
+from homeassistant.const import UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.recorder import get_instance
+
+from .const import BACKFILL_CHUNK, DOMAIN, EXECUTOR_THRESHOLD
+from .records import IntervalIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+
+def statistic_id(entry_id: str) -> str:
+    """Return the external statistic of a config entry."""
+    return f"{DOMAIN}:work_hours_{entry_id.lower()}"
+
+
+@callback
+def async_remove_statistics(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the imported statistics of a config entry."""
+    get_instance(hass).async_clear_statistics([statistic_id(entry_id)])
+
+
+def _floor_hour(timestamp: float) -> float:
+    return timestamp - timestamp % HOUR
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def hourly_statistics(
+    index: IntervalIndex,
+    start: float,
+    end: float,
+    base: float,
+) -> tuple[list[StatisticData], float]:
+    """Return the worked hours of every hour from start to end.
+
+    start and end are full hours; the running sum continues from base.
+    Also returns the sum after the last hour.
+    """
+    statistics = []
+    total = base
+    hour = start
+    while hour < end:
+        worked = index.seconds_between(hour, hour + HOUR) / HOUR
+        total += worked
+        statistics.append(
+            StatisticData(start=_utc(hour), state=round(worked, 4), sum=round(total, 4))
+        )
+        hour += HOUR
+    return statistics, total
+
+
+class WorkStatistics:
+    """Hourly worked hours in the long-term statistics of the recorder.
+
+    The history before the synced window is backfilled once, one chunk
+    of records at a time so memory stays bounded. After that the hours
+    of the synced window are imported again after every change.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, history_days: int) -> None:
+        self._hass = hass
+        self._history_days = history_days
+        self.statistic_id = statistic_id(entry_id)
+        self._metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name="TimeTagger working hours",
+            source=DOMAIN,
+            statistic_id=self.statistic_id,
+            unit_of_measurement=UnitOfTime.HOURS,
+        )
+        # The window is only imported after the backfill finished
+        self.ready = False
+        self._imported_until: float | None = None
+        # Start of the window and the running sum before it, the recorder
+        # may not have committed the backfill when the window is imported
+        self._base: tuple[float, float] | None = None
+
+    async def _async_hourly(
+        self, index: IntervalIndex, start: float, end: float, base: float
+    ) -> tuple[list[StatisticData], float]:
+        """Compile the hourly statistics, in the executor for large indexes."""
+        if len(index) < EXECUTOR_THRESHOLD:
+            return hourly_statistics(index, start, end, base)
+        return await self._hass.async_add_executor_job(
+            hourly_statistics, index, start, end, base
+        )
+
+    async def _async_last(self) -> tuple[float, float] | None:
+        """Return the start and sum of the latest imported hour."""
+        last = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics, self._hass, 1, self.statistic_id, True, {"sum"}
+        )
+        if not (rows := last.get(self.statistic_id)):
+            return None
+        return rows[0]["start"], rows[0].get("sum") or 0.0
+
+    async def _async_sum_before(self, start: float) -> float:
+        """Return the running sum at the end of the hour before start."""
+        rows = await get_instance(self._hass).async_add_executor_job(
+            statistics_during_period,
+            self._hass,
+            _utc(start - HOUR),
+            _utc(start),
+            {self.statistic_id},
+            "hour",
+            None,
+            {"sum"},
+        )
+        if rows.get(self.statistic_id):
+            return rows[self.statistic_id][-1].get("sum") or 0.0
+        last = await self._async_last()
+        if last is not None and last[0] < start:
+            return last[1]
+        return 0.0
+
+    async def async_backfill(
+        self,
+        fetch: Callable[[float, float], Awaitable[IntervalIndex]],
+        window_start: float,
+    ) -> None:
+        """Import the hours before the synced window that are missing."""
+        window_start = _floor_hour(window_start)
+        if (last := await self._async_last()) is None:
+            start = _floor_hour(window_start - self._history_days * DAY)
+            base = 0.0
+        else:
+            # Resume after the latest import, e.g. after a long downtime
+            start, base = last[0] + HOUR, last[1]
+
+        imported = 0
+        while start < window_start:
+            end = min(start + BACKFILL_CHUNK.total_seconds(), window_start)
+            index = await fetch(start, end)
+            statistics, base = await self._async_hourly(index, start, end, base)
+            async_add_external_statistics(self._hass, self._metadata, statistics)
+            imported += len(statistics)
+            start = end
+        self._base = (start, base)
+        _LOGGER.debug("Backfilled %s hours of TimeTagger statistics", imported)
+        self.ready = True
+
+    async def async_update(
+        self,
+        index: IntervalIndex,
+        window_start: float,
+        now: float,
+        changed: bool,
+    ) -> None:
+        """Import the completed hours of the synced window."""
+        if not self.ready:
+            return
+        start = _floor_hour(window_start)
+        end = _floor_hour(now)
+        if not changed and end == self._imported_until:
+            return
+        if self._base is not None and self._base[0] == start:
+            base = self._base[1]
+        else:
+            base = await self._async_sum_before(start)
+            self._base = (start, base)
+        statistics, _ = await self._async_hourly(index, start, end, base)
+        if statistics:
+            async_add_external_statistics(self._hass, self._metadata, statistics)
+        self._imported_until = end
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from datetime import date, timedelta
+import re
+
+_ONE_DAY = timedelta(days=1)
+# Full dates or MM-DD for days off on the same date every year
+_DAY_RE = re.compile(r"(?:(\d{4})-)?(\d{1,2})-(\d{1,2})")
+# Longest range of days off, guards against typos in the year
+_MAX_RANGE_DAYS = 366
+
+
+def parse_schedule(value: str, daily_target: float) -> tuple[float, ...]:
+    """Parse the target hours of Monday to Sunday, e.g. "8 8 8 8 6 0 0".
+
+    An empty value means daily_target on every weekday. Raises ValueError
+    unless there are seven non-negative hours of at most 24.
+    """
+    if not (value or "").strip():
+        return (daily_target,) * 5 + (0.0, 0.0)
+    hours = tuple(float(part) for part in value.replace(",", " ").split())
+    if len(hours) != 7 or not all(0 <= hour <= 24 for hour in hours):
+        raise ValueError(f"Invalid weekly schedule: {value}")
+    return hours
+
+
+def _parse_day(value: str) -> date | tuple[int, int]:
+    """Return a date, or (month, day) of a day off every year."""
+    if (match := _DAY_RE.fullmatch(value.strip())) is None:
+        raise ValueError(f"Invalid day: {value}")
+    year, month, day = match.groups()
+    # A leap year validates 02-29 of the yearly days
+    parsed = date(int(year or 2000), int(month), int(day))
+    return parsed if year else (parsed.month, parsed.day)
+
+
+def parse_days(value: str) -> tuple[frozenset[date], frozenset[tuple[int, int]]]:
+    """Parse "2024-12-24, 12-25, 2024-08-01..2024-08-14" into days off.
+
+    Returns the dates and the (month, day) of the days off every year.
+    Ranges include both ends and need full dates. Raises ValueError.
+    """
+    dates: set[date] = set()
+    yearly: set[tuple[int, int]] = set()
+    for part in (value or "").replace(";", ",").split(","):
+        if not part.strip():
+            continue
+        first, separator, last = part.partition("..")
+        start = _parse_day(first)
+        if not separator:
+            if isinstance(start, date):
+                dates.add(start)
+            else:
+                yearly.add(start)
+            continue
+        end = _parse_day(last)
+        if not isinstance(start, date) or not isinstance(end, date):
+            raise ValueError(f"Ranges need full dates: {part.strip()}")
+        if not 0 <= (end - start).days < _MAX_RANGE_DAYS:
+            raise ValueError(f"Invalid range: {part.strip()}")
+        while start <= end:
+            dates.add(start)
+            start += _ONE_DAY
+    return frozenset(dates), frozenset(yearly)
+
+
+class TargetCalendar:
+    """Target hours per day from a weekly schedule, minus the days off.
+
+    The cumulative targets of a month are computed once into a table, so
+    the target from the first of the month or the Monday of the week up
+    to a day is one or two lookups. The tables only depend on the
+    configuration, which is fixed for the life of a config entry; the
+    targets of the current day are kept until the day rolls over.
+    """
+
+    def __init__(
+        self,
+        schedule: Sequence[float],
+        days_off: Iterable[date] = (),
+        yearly_days_off: Iterable[tuple[int, int]] = (),
+    ) -> None:
+        if len(schedule) != 7:
+            raise ValueError("A schedule has the hours of seven weekdays")
+        self.schedule = tuple(schedule)
+        self._days_off = frozenset(days_off)
+        self._yearly_days_off = frozenset(yearly_days_off)
+        # Cumulative hours at the end of every day, index 0 is before the 1st
+        self._months: dict[tuple[int, int], tuple[float, ...]] = {}
+        self._day: date | None = None
+        self._targets = (0.0, 0.0)
+
+    def day_target(self, day: date) -> float:
+        """Return the target hours of a single day."""
+        if day in self._days_off or (day.month, day.day) in self._yearly_days_off:
+            return 0.0
+        return self.schedule[day.weekday()]
+
+    def _month(self, year: int, month: int) -> tuple[float, ...]:
+        """Return the cumulative target table of a month."""
+        if (table := self._months.get((year, month))) is None:
+            totals = [0.0]
+            day = date(year, month, 1)
+            while day.month == month:
+                totals.append(totals[-1] + self.day_target(day))
+                day += _ONE_DAY
+            table = self._months[year, month] = tuple(totals)
+        return table
+
+    def month_target(self, day: date) -> float:
+        """Return the target from the first of the month up to day."""
+        return round(self._month(day.year, day.month)[day.day], 2)
+
+    def week_target(self, day: date) -> float:
+        """Return the target from Monday up to day."""
+        monday = day - timedelta(days=day.weekday())
+        table = self._month(day.year, day.month)
+        if monday.month == day.month:
+            return round(table[day.day] - table[monday.day - 1], 2)
+        # The week started in the previous month
+        before = self._month(monday.year, monday.month)
+        return round(table[day.day] + before[-1] - before[monday.day - 1], 2)
+
+    def targets(self, day: date) -> tuple[float, float]:
+        """Return the week and month target up to day."""
+        if day != self._day:
+            self._targets = (self.week_target(day), self.month_target(day))
+            self._day = day
+        return self._targets
@@ -0,0 +1,119 @@
+"""Synthetic records and a fake TimeTagger server for the benchmarks."""
+from __future__ import annotations
+
+from functools import lru_cache
+import json
+import random
+import time
+from typing import Any
+
+import pytest
+
+DAY = 86400.0
+# Long enough to cover the current week and month
+SPAN = 35 * DAY
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    """Run every benchmark for each requested record count."""
+    if "record_count" in metafunc.fixturenames:
+        counts = metafunc.config.getoption("--bench-records")
+        metafunc.parametrize(
+            "record_count",
+            [int(count) for count in counts.split(",")],
+            ids=lambda count: f"{count}records",
+        )
+
+
+@lru_cache(maxsize=None)
+def generate_records(count: int, now: float) -> tuple[dict[str, Any], ...]:
+    """Return count records spread over the days before now.
+
+    The records are evenly spaced with some jitter, so a few of them
+    overlap. About one in ten carries other tags and one in fifty is
+    hidden, like records the server filters out.
+    """
+    rng = random.Random(count)
+    spacing = SPAN / count
+    records = []
+    for i in range(count):
+        t1 = now - SPAN + i * spacing + rng.uniform(0, spacing / 4)
+        t2 = min(t1 + spacing * rng.uniform(0.5, 1.2), now)
+        roll = rng.random()
+        if roll < 0.02:
+            ds = "HIDDEN #work #test"
+        elif roll < 0.12:
+            ds = "Lunch #private"
+        else:
+            ds = f"Task {i} #work #test"
+        records.append(
+            {"key": f"k{i}", "t1": t1, "t2": t2, "mt": t1, "st": t1, "ds": ds}
+        )
+    return tuple(records)
+
+
+@lru_cache(maxsize=None)
+def records_body(count: int, now: float) -> bytes:
+    """Return the JSON body of the records API for count records."""
+    records = list(generate_records(count, now))
+    return json.dumps({"records": records}).encode()
+
+
+def updates_body(server_time: float, records: list[dict[str, Any]]) -> bytes:
+    """Return the JSON body of the updates API."""
+    return json.dumps(
+        {"server_time": server_time, "reset": False, "records": records}
+    ).encode()
+
+
+class FakeStreamReader:
+    """Response content of the fake server."""
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    async def iter_chunked(self, n: int):
+        for pos in range(0, len(self._body), n):
+            yield self._body[pos : pos + n]
+
+
+class FakeResponse:
+    """Response of the fake server, decoded like aiohttp does."""
+
+    status = 200
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+        self.content = FakeStreamReader(body)
+
+    async def __aenter__(self) -> FakeResponse:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self) -> str:
+        return self._body.decode()
+
+    async def json(self, loads: Any = json.loads) -> Any:
+        return loads(self._body)
+
+
+class FakeSession:
+    """Session answering the TimeTagger API from prepared JSON bodies."""
+
+    def __init__(self, bodies: dict[str, bytes]) -> None:
+        # Keyed by the last path segment, "records" or "updates"
+        self.bodies = bodies
+
+    def get(self, url: str, **kwargs: Any) -> FakeResponse:
+        return FakeResponse(self.bodies[url.rsplit("/", 1)[-1]])
+
+
+@pytest.fixture(scope="session")
+def bench_now() -> float:
+    """Fixed current time of the synthetic records."""
+    return float(int(time.time()))
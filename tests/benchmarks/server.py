@@ -0,0 +1,125 @@
+"""Local stand-in for the TimeTagger API."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+import gzip
+import json
+import random
+import time
+from typing import Any
+
+from aiohttp import web
+
+# cspell:ignore authtoken timerange
+API_PATH = "/timetagger/api/v2"
+
+
+def _tags(ds: str) -> set[str]:
+    return {word.lower() for word in ds.replace(",", " ").split() if word[:1] == "#"}
+
+
+class TimeTaggerServer:
+    """Serve the records and updates API from an in-memory dataset.
+
+    The records API supports the timerange, tag, hidden and running
+    filters, the updates API returns the records modified since a server
+    time. Latency and an error rate can be set to test slow or flaky
+    servers, and every request is counted. Responses are gzipped when the
+    client accepts it, so bytes_sent is what went over the wire.
+    """
+
+    def __init__(
+        self,
+        records: list[dict[str, Any]] | tuple[dict[str, Any], ...] = (),
+        *,
+        token: str = "test_token",
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        compress: bool = True,
+        seed: int = 0,
+    ) -> None:
+        self.token = token
+        self.compress = compress
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._records: dict[str, dict[str, Any]] = {}
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+        now = time.time()
+        for record in records:
+            self._records[record["key"]] = {"st": now, **record}
+
+    async def __aenter__(self) -> TimeTaggerServer:
+        app = web.Application()
+        app.router.add_get(f"{API_PATH}/records", self._handle_records)
+        app.router.add_get(f"{API_PATH}/updates", self._handle_updates)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/timetagger"
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def put(self, record: dict[str, Any]) -> None:
+        """Insert or edit a record as a client would."""
+        now = time.time()
+        self._records[record["key"]] = {**record, "mt": now, "st": now}
+
+    async def _respond(
+        self, request: web.Request, name: str, body: Any
+    ) -> web.Response:
+        self.requests[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.headers.get("authtoken") != self.token:
+            return web.Response(status=401, text="Invalid authtoken")
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return web.Response(status=500, text="Internal server error")
+        data = json.dumps(body).encode()
+        headers = {}
+        if self.compress and "gzip" in request.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        self.bytes_sent += len(data)
+        return web.Response(
+            body=data, content_type="application/json", headers=headers
+        )
+
+    async def _handle_records(self, request: web.Request) -> web.Response:
+        query = request.query
+        start, _, end = query.get("timerange", "").partition("-")
+        t1 = float(start or 0)
+        t2 = float(end or "inf")
+        tags = _tags(query.get("tag", ""))
+        hidden = query.get("hidden", "true") != "false"
+        running = query.get("running")
+        records = []
+        for record in self._records.values():
+            ds = record.get("ds") or ""
+            is_running = record["t1"] == record["t2"]
+            if record["t1"] > t2 or (record["t2"] < t1 and not is_running):
+                continue
+            if not hidden and ds.startswith("HIDDEN"):
+                continue
+            if running is not None and is_running != (running == "true"):
+                continue
+            if not tags <= _tags(ds):
+                continue
+            records.append(record)
+        return await self._respond(request, "records", {"records": records})
+
+    async def _handle_updates(self, request: web.Request) -> web.Response:
+        since = float(request.query.get("since") or 0)
+        records = [r for r in self._records.values() if r["st"] > since]
+        body = {"server_time": time.time(), "reset": since == 0, "records": records}
+        return await self._respond(request, "updates", body)
@@ -0,0 +1,110 @@
+"""Benchmark the TimeTagger refresh and state-write cycle."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from custom_components.timetagger.const import DOMAIN
+from custom_components.timetagger.coordinator import TimeTaggerCoordinator
+
+from .conftest import FakeSession, generate_records, records_body, updates_body
+
+
+def _session(record_count: int, now: float, changed: int = 0) -> FakeSession:
+    """Return a fake server holding record_count records."""
+    records = generate_records(record_count, now)
+    edited = [{**record, "mt": now} for record in records[-changed:]] if changed else []
+    return FakeSession(
+        {
+            "records": records_body(record_count, now),
+            "updates": updates_body(now, edited),
+        }
+    )
+
+
+def test_update_seed(
+    benchmark, hass: HomeAssistant, mock_config_entry, record_count, bench_now
+) -> None:
+    """Benchmark a refresh that downloads all records."""
+    session = _session(record_count, bench_now)
+    with patch(
+        "custom_components.timetagger.coordinator.async_get_clientsession",
+        return_value=session,
+    ):
+        coordinator = TimeTaggerCoordinator(hass, mock_config_entry.data)
+
+    def refresh():
+        # An empty store makes every round reseed
+        coordinator._store.server_time = None
+        return hass.loop.run_until_complete(coordinator._async_update_data())
+
+    data = benchmark(refresh)
+
+    assert data.month_records > 0
+
+
+def test_update_delta(
+    benchmark, hass: HomeAssistant, mock_config_entry, record_count, bench_now
+) -> None:
+    """Benchmark a refresh that applies a small updates delta."""
+    session = _session(record_count, bench_now, changed=10)
+    with patch(
+        "custom_components.timetagger.coordinator.async_get_clientsession",
+        return_value=session,
+    ):
+        coordinator = TimeTaggerCoordinator(hass, mock_config_entry.data)
+    hass.loop.run_until_complete(coordinator._async_update_data())
+
+    def refresh():
+        return hass.loop.run_until_complete(coordinator._async_update_data())
+
+    data = benchmark(refresh)
+
+    assert data.month_records > 0
+
+
+async def test_aggregate(
+    benchmark, hass: HomeAssistant, mock_config_entry, record_count, bench_now
+) -> None:
+    """Benchmark computing the snapshot from the local store."""
+    coordinator = TimeTaggerCoordinator(hass, mock_config_entry.data)
+    coordinator._store.reset(
+        list(generate_records(record_count, bench_now)), bench_now, 0
+    )
+    now = datetime.fromtimestamp(bench_now, timezone.utc)
+
+    data = benchmark(coordinator._aggregate, now)
+
+    assert data.week_hours > 0
+
+
+def test_sensor_state_write(
+    benchmark,
+    hass: HomeAssistant,
+    mock_config_entry: ConfigEntry,
+    record_count,
+    bench_now,
+) -> None:
+    """Benchmark the snapshot and state writes of all sensors."""
+    session = _session(record_count, bench_now)
+    mock_config_entry.add_to_hass(hass)
+    with patch(
+        "custom_components.timetagger.coordinator.async_get_clientsession",
+        return_value=session,
+    ):
+        assert hass.loop.run_until_complete(
+            hass.config_entries.async_setup(mock_config_entry.entry_id)
+        )
+    hass.loop.run_until_complete(hass.async_block_till_done())
+    coordinator = hass.data[DOMAIN][mock_config_entry.entry_id]
+    now = datetime.fromtimestamp(bench_now, timezone.utc)
+
+    benchmark(coordinator._async_tick, now)
+
+    assert len(hass.states.async_entity_ids("sensor")) == 5
+    hass.loop.run_until_complete(
+        hass.config_entries.async_unload(mock_config_entry.entry_id)
+    )
@@ -0,0 +1,177 @@
+"""Benchmark the TimeTagger record store."""
+from __future__ import annotations
+
+import gzip
+import json
+import zlib
+
+import pytest
+
+from custom_components.timetagger.const import STREAM_CHUNK_SIZE
+from custom_components.timetagger.records import (
+    RecordStore,
+    RecordStreamDecoder,
+    parse_tag_groups,
+)
+
+from .conftest import DAY, SPAN, generate_records, records_body
+
+
+def _seeded_store(record_count: int, now: float) -> RecordStore:
+    store = RecordStore("#work,#test")
+    store.reset(list(generate_records(record_count, now)), now, now - SPAN)
+    return store
+
+
+def test_json_decode(benchmark, record_count, bench_now) -> None:
+    """Benchmark decoding the records API response."""
+    body = records_body(record_count, bench_now)
+
+    data = benchmark(json.loads, body)
+
+    assert len(data["records"]) == record_count
+
+
+def test_stream_decode(benchmark, record_count, bench_now) -> None:
+    """Benchmark decoding the records API response chunk by chunk."""
+    body = records_body(record_count, bench_now)
+
+    def decode():
+        decoder = RecordStreamDecoder()
+        count = 0
+        for pos in range(0, len(body), STREAM_CHUNK_SIZE):
+            count += len(decoder.feed(body[pos : pos + STREAM_CHUNK_SIZE]))
+        return count
+
+    assert benchmark(decode) == record_count
+
+
+def test_json_decode_orjson(benchmark, record_count, bench_now) -> None:
+    """Benchmark decoding the records API response with orjson."""
+    orjson = pytest.importorskip("orjson")
+    body = records_body(record_count, bench_now)
+
+    data = benchmark(orjson.loads, body)
+
+    assert len(data["records"]) == record_count
+
+
+def test_stream_decode_orjson(benchmark, record_count, bench_now) -> None:
+    """Benchmark the chunked decode with orjson decoding whole chunks."""
+    orjson = pytest.importorskip("orjson")
+    body = records_body(record_count, bench_now)
+
+    def decode():
+        decoder = RecordStreamDecoder(orjson.loads)
+        count = 0
+        for pos in range(0, len(body), STREAM_CHUNK_SIZE):
+            count += len(decoder.feed(body[pos : pos + STREAM_CHUNK_SIZE]))
+        return count
+
+    assert benchmark(decode) == record_count
+
+
+def test_gzip_stream_decode(benchmark, record_count, bench_now) -> None:
+    """Benchmark the chunked decode of a gzip compressed response."""
+    orjson = pytest.importorskip("orjson")
+    body = records_body(record_count, bench_now)
+    compressed = gzip.compress(body, compresslevel=6)
+    # Far less goes over the wire than with the plain body
+    assert len(compressed) * 4 < len(body)
+
+    def decode():
+        # wbits=31 reads the gzip container, like aiohttp does
+        inflate = zlib.decompressobj(wbits=31)
+        decoder = RecordStreamDecoder(orjson.loads)
+        count = 0
+        for pos in range(0, len(compressed), STREAM_CHUNK_SIZE):
+            chunk = inflate.decompress(compressed[pos : pos + STREAM_CHUNK_SIZE])
+            count += len(decoder.feed(chunk))
+        return count
+
+    assert benchmark(decode) == record_count
+
+
+def test_store_reset(benchmark, record_count, bench_now) -> None:
+    """Benchmark seeding the store from decoded records."""
+    records = list(generate_records(record_count, bench_now))
+    store = RecordStore("#work,#test")
+
+    benchmark(store.reset, records, bench_now, bench_now - SPAN)
+
+    assert 0 < len(store) < record_count
+
+
+def test_store_apply_delta(benchmark, record_count, bench_now) -> None:
+    """Benchmark applying an updates delta with one percent edited records."""
+    store = _seeded_store(record_count, bench_now)
+    edited = [
+        {**record, "t2": record["t2"] + 60, "mt": bench_now}
+        for record in generate_records(record_count, bench_now)[::100]
+    ]
+
+    benchmark(store.apply, edited)
+
+
+def test_index_build(benchmark, record_count, bench_now) -> None:
+    """Benchmark building the interval index after a change."""
+    store = _seeded_store(record_count, bench_now)
+
+    def build():
+        store._indexes = None
+        return store.index()
+
+    index = benchmark(build)
+
+    assert len(index) > 0
+
+
+def test_group_index_build(benchmark, record_count, bench_now) -> None:
+    """Benchmark building the work and three group indexes in one pass."""
+    groups = parse_tag_groups(
+        "Testing: #test; Private: #private; Other: #work|#private -#test"
+    )
+    store = RecordStore("#work,#test", groups)
+    store.reset(list(generate_records(record_count, bench_now)), bench_now, 0)
+
+    def build():
+        store._indexes = None
+        store.index()
+        return store._indexes
+
+    indexes = benchmark(build)
+
+    assert len(indexes) == 4
+    assert len(indexes[2]) > 0
+
+
+def test_period_queries(benchmark, record_count, bench_now) -> None:
+    """Benchmark the hours and record counts of one refresh."""
+    store = _seeded_store(record_count, bench_now)
+    store.index()
+    starts = (bench_now - DAY, bench_now - 7 * DAY, bench_now - 30 * DAY)
+
+    def query():
+        return [
+            (
+                store.hours_between(start, bench_now, bench_now),
+                store.count_between(start, bench_now),
+            )
+            for start in starts
+        ]
+
+    totals = benchmark(query)
+
+    assert totals[0][0] <= totals[1][0] <= totals[2][0]
+
+
+def test_tag_totals(benchmark, record_count, bench_now) -> None:
+    """Benchmark the per-tag breakdown of one refresh."""
+    store = RecordStore("#work")
+    store.reset(list(generate_records(record_count, bench_now)), bench_now, 0)
+    starts = (bench_now - DAY, bench_now - 7 * DAY, bench_now - 30 * DAY)
+
+    totals = benchmark(store.tag_totals, starts, bench_now, bench_now)
+
+    assert list(totals) == ["#test"]
+    assert totals["#test"][0][0] <= totals["#test"][2][0]
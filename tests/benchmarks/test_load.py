@@ -0,0 +1,144 @@
+"""Drive coordinators against the local TimeTagger stand-in server."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+import logging
+import statistics
+import time
+import tracemalloc
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from custom_components.timetagger.const import (
+    CONF_API_URL,
+    CONF_TOKEN,
+    CONF_WORK_TAGS,
+    FETCH_CHUNK,
+)
+from custom_components.timetagger.coordinator import (
+    Periods,
+    TimeTaggerCoordinator,
+    _time_chunks,
+)
+
+from .conftest import generate_records
+from .server import TimeTaggerServer
+
+_LOGGER = logging.getLogger(__name__)
+
+LOAD_TAGS = ["#work", "#work,#test", "#test", "#work", "#private"]
+LOAD_ROUNDS = 3
+
+
+def _coordinator(hass: HomeAssistant, url: str, tags: str) -> TimeTaggerCoordinator:
+    return TimeTaggerCoordinator(
+        hass, {CONF_API_URL: url, CONF_TOKEN: "test_token", CONF_WORK_TAGS: tags}
+    )
+
+
+def _seed_requests() -> int:
+    """Return the records requests seeding the window of the current time."""
+    now = datetime.now(timezone.utc)
+    start = Periods.at(now).window_start
+    return len(
+        _time_chunks(
+            int(start.timestamp()),
+            int(now.timestamp()),
+            int(FETCH_CHUNK.total_seconds()),
+        )
+    )
+
+
+async def _timed_refresh(coordinator: TimeTaggerCoordinator) -> float:
+    start = time.perf_counter()
+    await coordinator._async_update_data()
+    return time.perf_counter() - start
+
+
+async def test_server_seed_and_delta(
+    hass: HomeAssistant, socket_enabled, bench_now
+) -> None:
+    """Test a coordinator seeds and syncs over real HTTP."""
+    async with TimeTaggerServer(generate_records(1000, bench_now)) as server:
+        coordinator = _coordinator(hass, server.url, "#work,#test")
+
+        await coordinator._async_update_data()
+        seeded = len(coordinator._store)
+        assert seeded > 0
+        # The window is fetched in weekly chunks
+        requests = _seed_requests()
+        assert server.requests == {"updates": 1, "records": requests}
+
+        server.put(
+            {"key": "new", "t1": bench_now - 60, "t2": bench_now, "ds": "#work #test"}
+        )
+        await coordinator._async_update_data()
+
+        assert len(coordinator._store) == seeded + 1
+        assert server.requests == {"updates": 2, "records": requests}
+
+
+async def test_server_errors(hass: HomeAssistant, socket_enabled) -> None:
+    """Test server errors and bad tokens surface as failed updates."""
+    async with TimeTaggerServer(error_rate=1.0) as server:
+        coordinator = _coordinator(hass, server.url, "#work")
+        with pytest.raises(UpdateFailed, match="500"):
+            await coordinator._async_update_data()
+
+    async with TimeTaggerServer(token="other") as server:
+        coordinator = _coordinator(hass, server.url, "#work")
+        with pytest.raises(UpdateFailed, match="401"):
+            await coordinator._async_update_data()
+
+
+async def test_load(
+    hass: HomeAssistant,
+    socket_enabled,
+    record_count,
+    bench_now,
+    record_property,
+) -> None:
+    """Measure poll latency, memory and requests of concurrent coordinators."""
+    records = generate_records(record_count, bench_now)
+    async with TimeTaggerServer(records, latency=0.01) as server:
+        coordinators = [_coordinator(hass, server.url, tags) for tags in LOAD_TAGS]
+
+        tracemalloc.start()
+        try:
+            latencies = []
+            for round_ in range(LOAD_ROUNDS):
+                latencies += await asyncio.gather(
+                    *(_timed_refresh(coordinator) for coordinator in coordinators)
+                )
+                # Edit a few records between the polls
+                for record in records[round_ :: max(1, record_count // 10)]:
+                    server.put({**record, "t2": record["t2"] + 60})
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    # One seed per coordinator, every later round is one shared delta request
+    assert server.requests["records"] == len(LOAD_TAGS) * _seed_requests()
+    assert server.requests["updates"] == len(LOAD_TAGS) + LOAD_ROUNDS - 1
+
+    p50, p95 = (statistics.quantiles(latencies, n=20)[i] for i in (9, 18))
+    record_property("poll_p50_s", round(p50, 4))
+    record_property("poll_p95_s", round(p95, 4))
+    record_property("peak_memory_bytes", peak)
+    record_property("requests", dict(server.requests))
+    record_property("bytes_sent", server.bytes_sent)
+    _LOGGER.info(
+        "%s records, %s coordinators: poll p50 %.3fs p95 %.3fs, "
+        "peak memory %.1f MiB, %s requests, %s bytes",
+        record_count,
+        len(LOAD_TAGS),
+        p50,
+        p95,
+        peak / 2**20,
+        sum(server.requests.values()),
+        server.bytes_sent,
+    )
@@ -1,12 +1,15 @@
 """Common fixtures for TimeTagger tests."""
 from __future__ import annotations
 
-from unittest.mock import AsyncMock, patch
+import json
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 
+from custom_components.timetagger.coordinator import TimeTaggerData
 from custom_components.timetagger.const import (
     DOMAIN,
     CONF_API_URL,
@@ -16,6 +19,28 @@ from custom_components.timetagger.const import (
 )
 
 
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the record counts of the benchmarks."""
+    parser.addoption(
+        "--bench-records",
+        default="1000",
+        help="Comma separated record counts of the benchmarks, "
+        "e.g. 1000,100000,1000000",
+    )
+
+
+class MockStreamReader:
+    """Response content streaming a JSON body in small chunks."""
+
+    def __init__(self, data: Any, chunk_size: int = 16) -> None:
+        self.body = json.dumps(data).encode()
+        self._chunk_size = chunk_size
+
+    async def iter_chunked(self, n: int):
+        for pos in range(0, len(self.body), self._chunk_size):
+            yield self.body[pos : pos + self._chunk_size]
+
+
 @pytest.fixture
 def mock_config_entry() -> ConfigEntry:
     """Create a mock config entry."""
@@ -36,25 +61,19 @@ def mock_config_entry() -> ConfigEntry:
 
 
 @pytest.fixture
-def mock_timetagger_data():
-    """Mock TimeTagger API response data."""
-    return {
-        "today": [
-            {"t1": 1640995200, "t2": 1641024000},  # 8 hours
-            {"t1": 1641027600, "t2": 1641031200},  # 1 hour
-        ],
-        "week": [
-            {"t1": 1640995200, "t2": 1641024000},  # 8 hours
-            {"t1": 1641027600, "t2": 1641031200},  # 1 hour
-            {"t1": 1640908800, "t2": 1640937600},  # 8 hours (previous day)
-        ],
-        "month": [
-            {"t1": 1640995200, "t2": 1641024000},  # 8 hours
-            {"t1": 1641027600, "t2": 1641031200},  # 1 hour
-            {"t1": 1640908800, "t2": 1640937600},  # 8 hours
-            {"t1": 1640822400, "t2": 1640851200},  # 8 hours (2 days ago)
-        ],
-    }
+def mock_timetagger_data() -> TimeTaggerData:
+    """Mock aggregated TimeTagger data."""
+    return TimeTaggerData(
+        today_hours=9.0,  # 8 hours + 1 hour
+        week_hours=17.0,  # 8 hours previous day
+        month_hours=25.0,  # 8 hours 2 days ago
+        week_target=24.0,  # Wednesday, 3 days * 8 hours
+        month_target=80.0,  # 10 weekdays * 8 hours
+        today_records=2,
+        week_records=3,
+        month_records=4,
+        running=False,
+    )
 
 
 @pytest.fixture
@@ -68,15 +87,28 @@ def mock_coordinator(mock_timetagger_data):
 
 @pytest.fixture
 def mock_aiohttp_session():
-    """Mock aiohttp ClientSession."""
-    with patch("aiohttp.ClientSession") as mock_session:
-        mock_response = AsyncMock()
-        mock_response.status = 200
-        mock_response.json.return_value = {
+    """Mock the shared aiohttp ClientSession."""
+    mock_session = MagicMock()
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader(
+        {
             "records": [
-                {"t1": 1640995200, "t2": 1641024000},
-                {"t1": 1641027600, "t2": 1641031200},
+                {"key": "a", "t1": 1640995200, "t2": 1641024000},
+                {"key": "b", "t1": 1641027600, "t2": 1641031200},
             ]
         }
-        mock_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
-        yield mock_session
\ No newline at end of file
+    )
+    mock_session.get.return_value.__aenter__.return_value = mock_response
+    with patch(
+        "custom_components.timetagger.coordinator.async_get_clientsession",
+        return_value=mock_session,
+    ):
+        yield mock_session
+
+
+@pytest.fixture
+async def utc_time_zone(hass: HomeAssistant) -> None:
+    """Configure UTC, the time zone the test records are written in."""
+    await hass.config.async_set_time_zone("UTC")
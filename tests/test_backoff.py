@@ -0,0 +1,51 @@
+"""Test the retry backoff and circuit breaker."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.timetagger.backoff import CircuitBreaker, backoff_delay
+
+
+@pytest.mark.parametrize(
+    "attempt,expected",
+    [(0, (15.0, 30.0)), (1, (30.0, 60.0)), (3, (120.0, 240.0)), (40, (900.0, 1800.0))],
+)
+def test_backoff_delay(attempt, expected) -> None:
+    """Test the delay doubles up to the cap with its second half random."""
+    low = backoff_delay(attempt, 30.0, 1800.0, lambda a, b: a)
+    high = backoff_delay(attempt, 30.0, 1800.0, lambda a, b: b)
+
+    assert (low, high) == expected
+    assert low <= backoff_delay(attempt, 30.0, 1800.0) <= high
+
+
+def test_circuit_breaker() -> None:
+    """Test the breaker opens after failures and closes after a success."""
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=3, base=10.0, cap=100.0, clock=lambda: now[0])
+
+    assert breaker.state == "closed"
+    assert 5.0 <= breaker.record_failure() <= 10.0
+    assert 10.0 <= breaker.record_failure() <= 20.0
+    # Below the threshold a retry may be sent any time
+    assert breaker.allow()
+
+    delay = breaker.record_failure()
+    assert 20.0 <= delay <= 40.0
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.as_dict()["state"] == "open"
+    assert breaker.retry_in == delay
+
+    now[0] += delay
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+    # A failed probe opens the breaker for longer
+    assert breaker.record_failure() >= 40.0
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.failures == 0
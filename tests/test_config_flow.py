@@ -14,6 +14,15 @@ from custom_components.timetagger.const import (
     CONF_TOKEN,
     CONF_WORK_TAGS,
     CONF_DAILY_TARGET,
+    CONF_WORKDAY_START,
+    CONF_WORKDAY_END,
+    CONF_HISTORY_DAYS,
+    CONF_TAG_GROUPS,
+    CONF_TAG_BREAKDOWN,
+    CONF_WEEKLY_SCHEDULE,
+    CONF_HOLIDAYS,
+    CONF_VACATION,
+    CONF_REQUEST_TIMEOUT,
 )
 
 
@@ -47,6 +56,15 @@ async def test_config_flow_user_step_success(hass: HomeAssistant) -> None:
         CONF_TOKEN: "test_token",
         CONF_WORK_TAGS: "#work,#test",
         CONF_DAILY_TARGET: 8.0,
+        CONF_WORKDAY_START: 7,
+        CONF_WORKDAY_END: 19,
+        CONF_HISTORY_DAYS: 365,
+        CONF_TAG_GROUPS: "",
+        CONF_TAG_BREAKDOWN: False,
+        CONF_WEEKLY_SCHEDULE: "",
+        CONF_HOLIDAYS: "",
+        CONF_VACATION: "",
+        CONF_REQUEST_TIMEOUT: 30,
     }
 
 
@@ -70,6 +88,66 @@ async def test_config_flow_invalid_url(hass: HomeAssistant) -> None:
     assert result["errors"] == {"base": "invalid_url"}
 
 
+async def test_config_flow_invalid_tag_groups(hass: HomeAssistant) -> None:
+    """Test config flow rejects tag groups it cannot parse."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {
+            CONF_API_URL: "https://test.timetagger.com/timetagger/",
+            CONF_TOKEN: "test_token",
+            CONF_TAG_GROUPS: "Meetings: #meeting; #oncall",
+        },
+    )
+
+    assert result["type"] == data_entry_flow.FlowResultType.FORM
+    assert result["errors"] == {CONF_TAG_GROUPS: "invalid_tag_groups"}
+
+
+async def test_config_flow_invalid_targets(hass: HomeAssistant) -> None:
+    """Test an invalid schedule and invalid days off are rejected."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {
+            CONF_API_URL: "https://test.timetagger.com/timetagger/",
+            CONF_TOKEN: "test_token",
+            CONF_WEEKLY_SCHEDULE: "8 8 8 8 8",
+            CONF_VACATION: "2025-08-15..2025-08-04",
+        },
+    )
+
+    assert result["type"] == data_entry_flow.FlowResultType.FORM
+    assert result["errors"] == {
+        CONF_WEEKLY_SCHEDULE: "invalid_schedule",
+        CONF_VACATION: "invalid_days",
+    }
+
+
+async def test_config_flow_invalid_workday(hass: HomeAssistant) -> None:
+    """Test working hours ending before they start are rejected."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {
+            CONF_API_URL: "https://test.timetagger.com/timetagger/",
+            CONF_TOKEN: "test_token",
+            CONF_WORKDAY_START: 19,
+            CONF_WORKDAY_END: 7,
+        },
+    )
+
+    assert result["type"] == data_entry_flow.FlowResultType.FORM
+    assert result["errors"] == {CONF_WORKDAY_END: "invalid_workday"}
+
+
 async def test_config_flow_with_defaults(hass: HomeAssistant) -> None:
     """Test config flow uses default values correctly."""
     result = await hass.config_entries.flow.async_init(
@@ -7,9 +7,19 @@ from custom_components.timetagger.const import (
     CONF_TOKEN,
     CONF_WORK_TAGS,
     CONF_DAILY_TARGET,
+    CONF_WORKDAY_START,
+    CONF_WORKDAY_END,
+    CONF_HISTORY_DAYS,
     DEFAULT_DAILY_TARGET,
     DEFAULT_WORK_TAGS,
     DEFAULT_API_URL,
+    DEFAULT_WORKDAY_START,
+    DEFAULT_WORKDAY_END,
+    DEFAULT_HISTORY_DAYS,
+    POLL_INTERVAL_RUNNING,
+    POLL_INTERVAL_IDLE,
+    POLL_INTERVAL_IDLE_MAX,
+    POLL_INTERVAL_OFF_HOURS,
 )
 
 
@@ -24,6 +34,9 @@ def test_config_constants() -> None:
     assert CONF_TOKEN is None  # Security: no hardcoded token
     assert CONF_WORK_TAGS == "work_tags"
     assert CONF_DAILY_TARGET == "daily_target"
+    assert CONF_WORKDAY_START == "workday_start"
+    assert CONF_WORKDAY_END == "workday_end"
+    assert CONF_HISTORY_DAYS == "history_days"
 
 
 def test_default_values() -> None:
@@ -31,6 +44,16 @@ def test_default_values() -> None:
     assert DEFAULT_DAILY_TARGET == 8.0
     assert DEFAULT_WORK_TAGS == "#work,#home"
     assert DEFAULT_API_URL == "https://timetagger-host/timetagger/"
+    assert DEFAULT_WORKDAY_START == 7
+    assert DEFAULT_WORKDAY_END == 19
+    assert DEFAULT_HISTORY_DAYS == 365
+
+
+def test_poll_intervals() -> None:
+    """Test adaptive polling intervals are ordered sensibly."""
+    assert POLL_INTERVAL_RUNNING < POLL_INTERVAL_IDLE
+    assert POLL_INTERVAL_IDLE < POLL_INTERVAL_IDLE_MAX
+    assert POLL_INTERVAL_IDLE_MAX <= POLL_INTERVAL_OFF_HOURS
 
 
 def test_default_types() -> None:
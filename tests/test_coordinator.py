@@ -2,20 +2,36 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone, timedelta
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
-from aiohttp import ClientResponseError
+from aiohttp import ClientConnectionError, ClientResponseError
 
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.update_coordinator import UpdateFailed
 
-from custom_components.timetagger.coordinator import TimeTaggerCoordinator
+from custom_components.timetagger.coordinator import (
+    GroupHours,
+    Periods,
+    TimeTaggerCoordinator,
+    _time_chunks,
+)
+from custom_components.timetagger.records import RecordStore
 from custom_components.timetagger.const import (
     CONF_API_URL,
+    CONF_DAILY_TARGET,
+    CONF_HOLIDAYS,
+    CONF_TAG_GROUPS,
     CONF_TOKEN,
+    CONF_VACATION,
+    CONF_WEEKLY_SCHEDULE,
     CONF_WORK_TAGS,
 )
 
+from .conftest import MockStreamReader
+
+# Day, week and month boundaries of the records are at midnight UTC
+pytestmark = pytest.mark.usefixtures("utc_time_zone")
+
 
 @pytest.fixture
 def coordinator_config():
@@ -37,6 +53,43 @@ async def test_coordinator_init(hass: HomeAssistant, coordinator_config) -> None
     assert coordinator.update_interval == timedelta(minutes=5)
 
 
+async def test_statistics_need_recorder(
+    hass: HomeAssistant, coordinator_config
+) -> None:
+    """Test statistics are only imported with the recorder loaded."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config, "entry")
+    assert coordinator._statistics is None
+
+    hass.config.components.add("recorder")
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config, "entry")
+    assert coordinator._statistics.statistic_id == "timetagger:work_hours_entry"
+
+    coordinator_config["history_days"] = 0
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config, "entry")
+    assert coordinator._statistics is None
+
+
+async def test_coordinator_uses_shared_session(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test refreshes reuse HA's shared client session."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+
+    assert coordinator._session is mock_aiohttp_session
+
+    with patch("custom_components.timetagger.coordinator.datetime") as mock_datetime:
+        # The window of NOW fits in a single records request
+        mock_datetime.now.return_value = NOW
+        await coordinator._async_update_data()
+        await coordinator._async_update_data()
+
+    # Seeding takes two requests, the second refresh only syncs deltas
+    assert mock_aiohttp_session.get.call_count == 3
+    mock_aiohttp_session.close.assert_not_called()
+
+
 @pytest.mark.parametrize(
     "records,expected_hours",
     [
@@ -61,24 +114,28 @@ async def test_fetch_records_success(
 ) -> None:
     """Test successful fetch of records."""
     coordinator = TimeTaggerCoordinator(hass, coordinator_config)
-    
+    records = [{"key": f"r{i}", **record} for i, record in enumerate(records)]
+
     # Mock the response
     mock_response = AsyncMock()
     mock_response.status = 200
-    mock_response.json.return_value = {"records": records}
-    mock_aiohttp_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
+    mock_response.content = MockStreamReader({"records": records})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
     
     start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     end = datetime.now(timezone.utc)
-    
-    with patch("aiohttp.ClientSession", mock_aiohttp_session):
-        result = await coordinator._fetch_records(
-            mock_aiohttp_session.return_value.__aenter__.return_value,
-            start,
-            end,
-        )
-    
-    assert result == records
+    store = RecordStore("")
+    store.reset((), 0, 0)
+
+    result = await coordinator._fetch_records(
+        mock_aiohttp_session,
+        start,
+        end,
+        store,
+    )
+
+    assert result == len(records)
+    assert store.index().hours_between(0, 2000000000) == expected_hours
 
 
 async def test_fetch_records_api_error(
@@ -93,57 +150,800 @@ async def test_fetch_records_api_error(
     mock_response = AsyncMock()
     mock_response.status = 401
     mock_response.text.return_value = "Unauthorized"
-    mock_aiohttp_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
     
     start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     end = datetime.now(timezone.utc)
     
-    with patch("aiohttp.ClientSession", mock_aiohttp_session):
-        with pytest.raises(UpdateFailed, match="TimeTagger API error: 401"):
-            await coordinator._fetch_records(
-                mock_aiohttp_session.return_value.__aenter__.return_value,
-                start,
-                end,
-            )
+    with pytest.raises(UpdateFailed, match="TimeTagger API error: 401"):
+        await coordinator._fetch_records(
+            mock_aiohttp_session,
+            start,
+            end,
+            RecordStore(""),
+        )
+
+
+def test_time_chunks() -> None:
+    """Test long ranges are split into consecutive windows."""
+    assert _time_chunks(0, 10, 7) == [(0, 7), (7, 10)]
+    assert _time_chunks(0, 14, 7) == [(0, 7), (7, 14)]
+    assert _time_chunks(3, 5, 7) == [(3, 5)]
+
+
+async def test_fetch_records_in_chunks(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test long ranges are fetched as weekly windows and merged by key."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    store = RecordStore("")
+    store.reset((), 0, 0)
+
+    result = await coordinator._fetch_records(
+        mock_aiohttp_session, start, start + timedelta(days=20), store
+    )
+
+    t0, week = 1640995200, 7 * 86400
+    assert [
+        call.kwargs["params"]["timerange"]
+        for call in mock_aiohttp_session.get.call_args_list
+    ] == [
+        f"{t0}-{t0 + week}",
+        f"{t0 + week}-{t0 + 2 * week}",
+        f"{t0 + 2 * week}-{t0 + 20 * 86400}",
+    ]
+    # Every window returned both records, the store keeps each once
+    assert result == 6
+    assert len(store) == 2
+    assert coordinator._sample.requests == 3
+
+
+async def test_fetch_records_retries_chunks(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test a failed window is retried without refetching the others."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    store = RecordStore("")
+    store.reset((), 0, 0)
+    request = mock_aiohttp_session.get.return_value
+    mock_aiohttp_session.get.side_effect = [
+        ClientConnectionError("reset"),
+        request,
+        request,
+        TimeoutError,
+        request,
+    ]
+
+    with patch("custom_components.timetagger.coordinator.FETCH_RETRY_DELAY", 0):
+        await coordinator._fetch_records(
+            mock_aiohttp_session, start, start + timedelta(days=20), store
+        )
+
+    assert mock_aiohttp_session.get.call_count == 5
+    assert len(store) == 2
+
+    # A window failing on every attempt fails the whole range
+    mock_aiohttp_session.get.side_effect = ClientConnectionError("down")
+    with patch(
+        "custom_components.timetagger.coordinator.FETCH_RETRY_DELAY", 0
+    ), pytest.raises(ClientConnectionError):
+        await coordinator._fetch_records(
+            mock_aiohttp_session, start, start + timedelta(days=20), store
+        )
+
+
+WORK_RECORDS = [
+    {"key": "r1", "t1": 1640995200, "t2": 1641024000, "mt": 1, "ds": "#work"},
+    {"key": "r2", "t1": 1641027600, "t2": 1641031200, "mt": 1, "ds": "#work #test"},
+    {"key": "r3", "t1": 1640908800, "t2": 1640937600, "mt": 1, "ds": "#work"},
+    {"key": "r4", "t1": 1640822400, "t2": 1640851200, "mt": 1, "ds": "#work"},
+]
+
+# Saturday 2022-01-01 10:00 UTC: the week started on Monday 2021-12-27
+NOW = datetime(2022, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
 
 
 async def test_async_update_data_success(
     hass: HomeAssistant,
     coordinator_config,
     mock_aiohttp_session,
-    mock_timetagger_data,
 ) -> None:
-    """Test successful data update."""
+    """Test the first refresh seeds the store and partitions it locally."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
     coordinator = TimeTaggerCoordinator(hass, coordinator_config)
-    
-    # Mock the response for different time ranges
+
     mock_response = AsyncMock()
     mock_response.status = 200
-    
-    def mock_json_side_effect():
-        # Return different data based on call order
-        if not hasattr(mock_json_side_effect, "call_count"):
-            mock_json_side_effect.call_count = 0
-        
-        mock_json_side_effect.call_count += 1
-        
-        if mock_json_side_effect.call_count == 1:
-            return {"records": mock_timetagger_data["today"]}
-        elif mock_json_side_effect.call_count == 2:
-            return {"records": mock_timetagger_data["week"]}
-        else:
-            return {"records": mock_timetagger_data["month"]}
-    
-    mock_response.json.side_effect = mock_json_side_effect
-    mock_aiohttp_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
-    
-    with patch("aiohttp.ClientSession", mock_aiohttp_session):
+    mock_response.json.return_value = {
+        "server_time": 1641031200.5,
+        "reset": False,
+        "records": [],
+    }
+    mock_response.content = MockStreamReader({"records": WORK_RECORDS})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    with patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW
         result = await coordinator._async_update_data()
-    
-    assert "today" in result
-    assert "week" in result
-    assert "month" in result
-    assert result["today"] == mock_timetagger_data["today"]
+
+    assert mock_aiohttp_session.get.call_count == 2
+    params = mock_aiohttp_session.get.call_args.kwargs["params"]
+    assert params["timerange"] == "1640563200-1641031200"
+    headers = mock_aiohttp_session.get.call_args.kwargs["headers"]
+    assert headers["authtoken"] == "test_token"
+    assert "gzip" in headers["Accept-Encoding"]
+    assert coordinator._store.server_time == 1641031200.5
+
+    assert result.today_hours == 9.0
+    assert result.week_hours == 25.0
+    assert result.month_hours == 9.0
+    assert (result.today_records, result.week_records, result.month_records) == (
+        2,
+        4,
+        2,
+    )
+
+
+async def test_async_update_data_incremental(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test later refreshes only apply the deltas from the updates API."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+
+    edited = {**WORK_RECORDS[1], "t2": 1641034800, "mt": 2}
+    deleted = {**WORK_RECORDS[0], "ds": "HIDDEN #work", "mt": 2}
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.return_value = {
+        "server_time": 1641035000.0,
+        "reset": False,
+        "records": [edited, deleted],
+    }
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    with patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW.replace(hour=11)
+        result = await coordinator._async_update_data()
+
+    mock_aiohttp_session.get.assert_called_once()
+    assert mock_aiohttp_session.get.call_args.args[0].endswith("/api/v2/updates")
+    params = mock_aiohttp_session.get.call_args.kwargs["params"]
+    assert params == {"since": 1641031200.5}
+    assert coordinator._store.server_time == 1641035000.0
+    assert result.today_hours == 2.0
+    assert result.today_records == 1
+
+
+async def test_large_seed_prepared_in_executor(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test a large window is sorted and indexed before it is swapped in."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader({"records": WORK_RECORDS})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    with patch(
+        "custom_components.timetagger.coordinator.EXECUTOR_THRESHOLD", 4
+    ), patch.object(
+        hass, "async_add_executor_job", wraps=hass.async_add_executor_job
+    ) as mock_executor, patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW
+        result = await coordinator._async_update_data()
+
+    mock_executor.assert_called_once_with(coordinator._store.prepare)
+    assert (result.today_hours, result.week_hours) == (9.0, 25.0)
+
+
+async def test_large_updates_applied_to_copy(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test large updates are applied in the executor and swapped in."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+    store = coordinator._store
+    updates = {
+        "server_time": 1641035000.0,
+        "reset": False,
+        "records": [
+            {**WORK_RECORDS[1], "t2": 1641034800, "mt": 2},
+            {**WORK_RECORDS[0], "ds": "HIDDEN #work", "mt": 2},
+        ],
+    }
+    mock_response = mock_aiohttp_session.get.return_value.__aenter__.return_value
+    mock_response.json.return_value = updates
+
+    with patch(
+        "custom_components.timetagger.coordinator.EXECUTOR_THRESHOLD", 2
+    ), patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW.replace(hour=11)
+        result = await coordinator._async_update_data()
+
+    assert coordinator._store is not store
+    assert len(store) == 4
+    assert coordinator._store.server_time == 1641035000.0
+    assert (result.today_hours, result.today_records) == (2.0, 1)
+
+
+async def test_small_updates_to_large_store_applied_to_copy(
+    hass: HomeAssistant, coordinator_config
+) -> None:
+    """Test a few changes to a large store are applied in the executor too."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+    store = coordinator._store
+    updates = {
+        "server_time": 1641035000.0,
+        "records": [{**WORK_RECORDS[1], "t2": 1641034800, "mt": 2}],
+    }
+
+    with patch(
+        "custom_components.timetagger.coordinator.EXECUTOR_THRESHOLD", 4
+    ), patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW.replace(hour=11)
+        # Handed over by another entry of the same account
+        coordinator.async_apply_updates(updates)
+        assert coordinator._store is store
+        await hass.async_block_till_done()
+
+    assert coordinator._store is not store
+    assert store.server_time == 1641031200.5
+    assert coordinator._store.server_time == 1641035000.0
+    assert coordinator.data.today_hours == 10.0
+    await coordinator.async_shutdown()
+
+
+async def test_refresh_metrics(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test refreshes record timings, sizes and errors."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.read.return_value = b'{"records": []}'
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader({"records": WORK_RECORDS})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+    listener = MagicMock()
+    remove_listener = coordinator.async_add_metrics_listener(listener)
+
+    with patch("custom_components.timetagger.coordinator.datetime") as mock_datetime:
+        # The window of NOW fits in a single records request
+        mock_datetime.now.return_value = NOW
+        await coordinator._async_update_data()
+
+    listener.assert_called_once()
+    sample = coordinator.metrics.last
+    assert sample.requests == 2
+    assert sample.bytes == 15 + len(mock_response.content.body)
+    assert sample.records == 4
+    assert sample.total >= sample.request + sample.download + sample.decode
+    assert coordinator.metrics.refreshes == 1
+
+    mock_response.status = 500
+    with pytest.raises(UpdateFailed):
+        await coordinator._async_update_data()
+
+    assert coordinator.metrics.errors == {"UpdateFailed": 1}
+    assert coordinator.metrics.refreshes == 1
+    assert listener.call_count == 2
+    remove_listener()
+    diagnostics = coordinator.diagnostics()
+    assert diagnostics["records"] == 4
+    assert diagnostics["metrics"]["errors"] == {"UpdateFailed": 1}
+
+
+async def test_failing_server_backs_off(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test failed refreshes back off and open the circuit breaker."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    mock_response = mock_aiohttp_session.get.return_value.__aenter__.return_value
+    mock_response.status = 503
+    mock_response.text.return_value = "Service unavailable"
+
+    delays = []
+    for _ in range(3):
+        with pytest.raises(UpdateFailed, match="503"):
+            await coordinator._async_update_data()
+        delays.append(coordinator.update_interval)
+
+    assert timedelta(seconds=15) <= delays[0] <= timedelta(seconds=30)
+    assert timedelta(seconds=60) <= delays[2] <= timedelta(seconds=120)
+    assert coordinator.diagnostics()["breaker"]["state"] == "open"
+
+    # While open, refreshes do not send requests
+    calls = mock_aiohttp_session.get.call_count
+    with pytest.raises(UpdateFailed, match="unavailable"):
+        await coordinator._async_update_data()
+    assert mock_aiohttp_session.get.call_count == calls
+    assert coordinator.metrics.errors == {"UpdateFailed": 3}
+
+    # A successful probe closes the breaker
+    coordinator._breaker._open_until = 0.0
+    mock_response.status = 200
+    await coordinator._async_update_data()
+    assert coordinator.diagnostics()["breaker"]["state"] == "closed"
+
+
+async def test_async_update_data_reset(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test a reset from the updates API reseeds the store."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.side_effect = [
+        {"server_time": 1641035000.0, "reset": True, "records": []},
+        {"server_time": 1641035000.0, "reset": False, "records": []},
+    ]
+    mock_response.content = MockStreamReader({"records": WORK_RECORDS[:1]})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    with patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW
+        result = await coordinator._async_update_data()
+
+    assert mock_aiohttp_session.get.call_count == 3
+    assert result.week_hours == 8.0
+    assert result.week_records == 1
+
+
+async def test_incomplete_stream_keeps_store(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test a truncated records response does not replace the store."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+    store = coordinator._store
+
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.side_effect = [
+        {"server_time": 1641035000.0, "reset": True, "records": []},
+        {"server_time": 1641035000.0, "reset": False, "records": []},
+    ]
+    content = MockStreamReader({"records": WORK_RECORDS})
+    content.body = content.body[:-20]
+    mock_response.content = content
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    with pytest.raises(UpdateFailed, match="incomplete"):
+        await coordinator._async_update_data()
+
+    assert coordinator._store is store
+    assert len(store) == 4
+
+
+@pytest.mark.parametrize("threshold", [5000, 4])
+async def test_async_load_cache(
+    hass: HomeAssistant,
+    coordinator_config,
+    hass_storage,
+    threshold: int,
+) -> None:
+    """Test cached records are published without touching the API.
+
+    Large caches are restored in the executor.
+    """
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    hass_storage["timetagger.test_entry"] = {
+        "version": 1,
+        "key": "timetagger.test_entry",
+        "data": {
+            "tags": ["#work"],
+            "server_time": 1641031200.5,
+            "start": 1640563200.0,
+            "records": WORK_RECORDS,
+        },
+    }
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config, "test_entry")
+
+    with patch(
+        "custom_components.timetagger.coordinator.EXECUTOR_THRESHOLD", threshold
+    ), patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW
+        assert await coordinator.async_load_cache()
+
+    assert coordinator._store.server_time == 1641031200.5
+    assert coordinator.data.today_hours == 9.0
+    assert coordinator.data.week_records == 4
+
+
+async def test_async_load_cache_other_tags(
+    hass: HomeAssistant,
+    coordinator_config,
+    hass_storage,
+) -> None:
+    """Test a cache written for other work tags is ignored."""
+    hass_storage["timetagger.test_entry"] = {
+        "version": 1,
+        "key": "timetagger.test_entry",
+        "data": {
+            "tags": ["#home"],
+            "server_time": 1641031200.5,
+            "start": 1640563200.0,
+            "records": WORK_RECORDS,
+        },
+    }
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config, "test_entry")
+
+    assert not await coordinator.async_load_cache()
+    assert coordinator.data is None
+
+
+async def test_async_load_cache_without_entry(
+    hass: HomeAssistant,
+    coordinator_config,
+) -> None:
+    """Test a coordinator without config entry has no cache."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+
+    assert not await coordinator.async_load_cache()
+
+
+async def test_hours_between(hass: HomeAssistant, coordinator_config) -> None:
+    """Test arbitrary ranges are answered from the local store."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+
+    # 2021-12-31 04:00 - 2022-01-01 02:00 covers 4 + 2 hours
+    start = datetime(2021, 12, 31, 4, 0, 0, tzinfo=timezone.utc)
+    assert coordinator.hours_between(start, start + timedelta(hours=22)) == 6.0
+
+
+async def test_tag_group_totals(hass: HomeAssistant, coordinator_config) -> None:
+    """Test tag groups are split locally from the same records."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator_config[CONF_TAG_GROUPS] = "Testing: #test; Other: #work -#test"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+
+    data = coordinator._aggregate(NOW)
+
+    assert data.week_hours == 25.0
+    assert data.groups == {
+        "Testing": GroupHours(today=1.0, week=1.0, month=1.0, week_records=1),
+        "Other": GroupHours(today=8.0, week=24.0, month=8.0, week_records=3),
+    }
+
+
+async def test_running_timer_ticks_locally(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test running timers advance the totals every minute without polling."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(
+        # Timer started at 2022-01-01 09:00
+        [{"key": "run", "t1": 1641027600, "t2": 1641027600, "mt": 1, "ds": "#work"}],
+        1641031200.5,
+        1640563200.0,
+    )
+    listener = MagicMock()
+    remove_listener = coordinator.async_add_listener(listener)
+
+    with patch(
+        "custom_components.timetagger.coordinator.async_track_time_interval"
+    ) as mock_track:
+        coordinator._update_tick()
+        coordinator._update_tick()
+
+    mock_track.assert_called_once()
+    assert mock_track.call_args.args[2] == timedelta(minutes=1)
+
+    coordinator._async_tick(NOW + timedelta(minutes=30))
+
+    assert coordinator.data.today_hours == 1.5
+    assert coordinator.data.running
+    listener.assert_called_once()
+    mock_aiohttp_session.get.assert_not_called()
+
+    # Stopping the timer cancels the tick
+    coordinator._store.apply(
+        [{"key": "run", "t1": 1641027600, "t2": 1641031200, "mt": 2, "ds": "#work"}]
+    )
+    coordinator._update_tick()
+    mock_track.return_value.assert_called_once()
+    assert coordinator._unsub_tick is None
+    remove_listener()
+
+
+async def test_unchanged_totals_notify_no_listeners(
+    hass: HomeAssistant, coordinator_config
+) -> None:
+    """Test listeners are only called when the totals changed."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+    coordinator.data = coordinator._aggregate(NOW)
+    listener = MagicMock()
+    remove_listener = coordinator.async_add_listener(listener)
+
+    assert coordinator.always_update is False
+    coordinator._async_tick(NOW + timedelta(minutes=1))
+    listener.assert_not_called()
+
+    coordinator._store.apply(
+        [{"key": "r5", "t1": 1641031200, "t2": 1641034800, "mt": 1, "ds": "#work"}]
+    )
+    coordinator._async_tick(NOW + timedelta(hours=1))
+    listener.assert_called_once()
+    remove_listener()
+    await coordinator.async_shutdown()
+
+
+TAGS = "#work #test"
+
+
+async def test_period_totals_clip_and_merge(
+    hass: HomeAssistant,
+    coordinator_config,
+) -> None:
+    """Test period totals clip at boundaries and count overlaps once."""
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(
+        [
+            # 2021-12-31 23:00 - 2022-01-01 01:00 crosses midnight and month
+            {"key": "a", "t1": 1640991600, "t2": 1640998800, "mt": 1, "ds": TAGS},
+            # 2022-01-01 00:30 - 02:00 overlaps the first record
+            {"key": "b", "t1": 1640997000, "t2": 1641002400, "mt": 1, "ds": TAGS},
+            # 2022-01-01 02:00 - 03:00 starts where the second one ends
+            {"key": "c", "t1": 1641002400, "t2": 1641006000, "mt": 1, "ds": TAGS},
+        ],
+        1641031200.5,
+        1640563200.0,
+    )
+
+    result = coordinator._aggregate(NOW)
+
+    assert result.today_hours == 3.0
+    assert result.week_hours == 4.0
+    assert result.month_hours == 3.0
+    assert (result.today_records, result.week_records) == (3, 3)
+
+
+async def test_periods_local_time_zone(hass: HomeAssistant) -> None:
+    """Test the periods start at midnight in the configured time zone."""
+    await hass.config.async_set_time_zone("Europe/Berlin")
+
+    # Monday 2022-01-31 23:30 UTC is already February in Berlin
+    periods = Periods.at(datetime(2022, 1, 31, 23, 30, tzinfo=timezone.utc))
+
+    assert periods.day == datetime(2022, 2, 1).date()
+    assert periods.today == datetime(2022, 1, 31, 23, tzinfo=timezone.utc)
+    assert periods.week == datetime(2022, 1, 30, 23, tzinfo=timezone.utc)
+    assert periods.month == periods.today
+    assert periods.window_start == periods.week
+
+    # The day the clocks are set forward only has 23 hours
+    periods = Periods.at(datetime(2022, 3, 27, 12, tzinfo=timezone.utc))
+    assert periods.next_day.timestamp() - periods.today.timestamp() == 23 * 3600
+
+
+async def test_totals_in_local_time_zone(
+    hass: HomeAssistant, coordinator_config
+) -> None:
+    """Test records count for the local day, week and month they are in."""
+    await hass.config.async_set_time_zone("Europe/Berlin")
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(
+        [
+            # Monday 2022-01-31 10:00 - 12:00 UTC
+            {"key": "a", "t1": 1643623200, "t2": 1643630400, "mt": 1, "ds": "#work"},
+            # 23:15 - 23:45 UTC is Tuesday 2022-02-01 in Berlin
+            {"key": "b", "t1": 1643670900, "t2": 1643672700, "mt": 1, "ds": "#work"},
+        ],
+        1643673000.0,
+        1643583600.0,
+    )
+
+    data = coordinator._aggregate(datetime(2022, 1, 31, 23, 50, tzinfo=timezone.utc))
+
+    assert (data.today_hours, data.week_hours, data.month_hours) == (0.5, 2.5, 0.5)
+    assert (data.week_target, data.month_target) == (16.0, 8.0)
+    await coordinator.async_shutdown()
+
+
+async def test_periods_roll_over_at_midnight(
+    hass: HomeAssistant, coordinator_config
+) -> None:
+    """Test the periods are cached for the day and rolled over at midnight."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+    coordinator.data = coordinator._aggregate(NOW)
+    periods = coordinator._periods
+    listener = MagicMock()
+    remove_listener = coordinator.async_add_listener(listener)
+
+    assert coordinator._periods_at(NOW + timedelta(hours=13)) is periods
+    assert coordinator.data.today_hours == 9.0
+
+    # Fired a moment before midnight, the new day is published anyway
+    midnight = periods.next_day
+    coordinator._async_rollover(midnight, midnight - timedelta(milliseconds=5))
+
+    assert coordinator._periods.day == datetime(2022, 1, 2).date()
+    assert coordinator.data.today_hours == 0.0
+    assert coordinator._unsub_rollover is not None
+    listener.assert_called_once()
+
+    remove_listener()
+    await coordinator.async_shutdown()
+    assert coordinator._unsub_rollover is None
+
+
+def test_target_calendar_from_config() -> None:
+    """Test the targets follow the schedule, holidays and vacation."""
+    from custom_components.timetagger.coordinator import _target_calendar
+
+    calendar = _target_calendar(
+        {
+            CONF_DAILY_TARGET: 7.0,
+            CONF_HOLIDAYS: "01-06",
+            CONF_VACATION: "2022-01-10..2022-01-11",
+        }
+    )
+    # 3-7: 5 weekdays minus Epiphany, 10-11: vacation, 12-14: 3 weekdays
+    assert calendar.targets(datetime(2022, 1, 15).date()) == (21.0, 49.0)
+
+    calendar = _target_calendar({CONF_WEEKLY_SCHEDULE: "8 8 8 8 6 0 0"})
+    assert calendar.targets(datetime(2022, 1, 8).date()) == (38.0, 38.0)
+
+
+def test_data_derived_values(mock_timetagger_data) -> None:
+    """Test remaining and balance hours of the aggregated data."""
+    assert mock_timetagger_data.week_remaining == 7.0
+    assert mock_timetagger_data.month_balance == -55.0
+
+
+@pytest.mark.parametrize(
+    "now,running,idle_polls,expected",
+    [
+        # Wednesday during working hours
+        (datetime(2022, 1, 5, 10, 0), True, 0, timedelta(minutes=2)),
+        (datetime(2022, 1, 5, 10, 0), False, 0, timedelta(minutes=5)),
+        (datetime(2022, 1, 5, 10, 0), False, 1, timedelta(minutes=10)),
+        (datetime(2022, 1, 5, 10, 0), False, 2, timedelta(minutes=20)),
+        (datetime(2022, 1, 5, 10, 0), False, 3, timedelta(minutes=30)),
+        (datetime(2022, 1, 5, 10, 0), False, 1000, timedelta(minutes=30)),
+        # Evening, early morning and a day off
+        (datetime(2022, 1, 5, 19, 0), False, 0, timedelta(hours=1)),
+        (datetime(2022, 1, 5, 3, 0), False, 0, timedelta(hours=1)),
+        (datetime(2022, 1, 5, 6, 40), False, 0, timedelta(minutes=20)),
+        (datetime(2022, 1, 8, 10, 0), False, 0, timedelta(hours=1)),
+        # A running timer wins outside working hours as well
+        (datetime(2022, 1, 8, 22, 0), True, 0, timedelta(minutes=2)),
+    ],
+)
+def test_poll_interval(now, running, idle_polls, expected) -> None:
+    """Test the adaptive polling interval."""
+    from custom_components.timetagger.coordinator import _poll_interval
+
+    # Saturday the 8th has no target
+    workday = now.weekday() < 5
+    assert _poll_interval(now, running, idle_polls, (7, 19), workday) == expected
+
+
+async def test_poll_interval_follows_calendar(
+    hass: HomeAssistant, coordinator_config
+) -> None:
+    """Test days without a target are polled like weekends."""
+    coordinator_config[CONF_WEEKLY_SCHEDULE] = "8 8 8 8 8 4 0"
+    coordinator_config[CONF_HOLIDAYS] = "01-05"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+
+    # A holiday on Wednesday and a working Saturday
+    coordinator._schedule_polls(datetime(2022, 1, 5, 10, tzinfo=timezone.utc), True)
+    assert coordinator.update_interval == timedelta(hours=1)
+    coordinator._schedule_polls(datetime(2022, 1, 8, 10, tzinfo=timezone.utc), True)
+    assert coordinator.update_interval == timedelta(minutes=5)
+
+
+async def test_update_interval_adapts(
+    hass: HomeAssistant,
+    coordinator_config,
+    mock_aiohttp_session,
+) -> None:
+    """Test refreshes back off while idle and speed up for running timers."""
+    coordinator_config[CONF_WORK_TAGS] = "#work"
+    coordinator = TimeTaggerCoordinator(hass, coordinator_config)
+    coordinator._store.reset(WORK_RECORDS, 1641031200.5, 1640563200.0)
+
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.side_effect = [
+        {"server_time": 1641031300.0, "reset": False, "records": []},
+        {"server_time": 1641031400.0, "reset": False, "records": []},
+        {
+            "server_time": 1641031500.0,
+            "reset": False,
+            "records": [
+                {
+                    "key": "r5",
+                    "t1": 1641031400,
+                    "t2": 1641031400,
+                    "mt": 3,
+                    "ds": "#work",
+                }
+            ],
+        },
+    ]
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    from custom_components.timetagger.coordinator import _poll_interval
+
+    with patch(
+        "custom_components.timetagger.coordinator._poll_interval",
+        wraps=_poll_interval,
+    ) as mock_interval, patch(
+        "custom_components.timetagger.coordinator.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = NOW
+        await coordinator._async_update_data()
+        assert mock_interval.call_args.args[1:3] == (False, 1)
+        await coordinator._async_update_data()
+        assert mock_interval.call_args.args[1:3] == (False, 2)
+        await coordinator._async_update_data()
+        assert mock_interval.call_args.args[1:3] == (True, 0)
+        assert coordinator.update_interval == timedelta(minutes=2)
+
+    assert mock_interval.call_count == 3
+    assert [r.key for r in coordinator._store.running] == ["r5"]
+    # Stops the tick of the running timer
+    await coordinator.async_shutdown()
 
 
 def test_utc_ts() -> None:
@@ -0,0 +1,41 @@
+"""Test TimeTagger diagnostics."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock
+
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+
+from custom_components.timetagger.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+
+from .conftest import MockStreamReader
+
+
+async def test_diagnostics(
+    hass: HomeAssistant,
+    mock_config_entry: ConfigEntry,
+    mock_aiohttp_session,
+) -> None:
+    """Test diagnostics contain the refresh metrics but no secrets."""
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.read.return_value = b"{}"
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader({"records": []})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+
+    mock_config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, mock_config_entry)
+
+    assert diagnostics["config"]["work_tags"] == "#work,#test"
+    assert "test_token_123" not in str(diagnostics)
+    assert "test.timetagger.com" not in str(diagnostics)
+    metrics = diagnostics["coordinator"]["metrics"]
+    assert metrics["refreshes"] == 1
+    assert metrics["last"]["requests"] == 2
+    assert metrics["last"]["bytes"] == 2 + len(mock_response.content.body)
@@ -0,0 +1,126 @@
+"""Test the updates feed shared between config entries."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+import time
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.timetagger.const import (
+    CONF_API_URL,
+    CONF_TOKEN,
+    CONF_WORK_TAGS,
+)
+from custom_components.timetagger.coordinator import Periods, TimeTaggerCoordinator
+from custom_components.timetagger.feed import async_get_feed
+
+API_URL = "https://test.timetagger.com/timetagger"
+
+
+def _coordinator(
+    hass: HomeAssistant, tags: str, api_url: str = API_URL, token: str = "token"
+) -> TimeTaggerCoordinator:
+    coordinator = TimeTaggerCoordinator(
+        hass, {CONF_API_URL: api_url, CONF_TOKEN: token, CONF_WORK_TAGS: tags}
+    )
+    # Seeded at the start of the current window
+    start = Periods.at(datetime.now(timezone.utc)).window_start.timestamp()
+    coordinator._store.reset((), 1000.0, start)
+    return coordinator
+
+
+def _updates(mock_aiohttp_session, records: list[dict]) -> None:
+    response = mock_aiohttp_session.get.return_value.__aenter__.return_value
+    response.json.return_value = {"server_time": 2000.0, "records": records}
+
+
+async def test_feed_per_account(hass: HomeAssistant) -> None:
+    """Test entries share a feed only for the same URL and token."""
+    feed = async_get_feed(hass, API_URL, "token")
+
+    assert async_get_feed(hass, API_URL.upper() + "/", "token") is feed
+    assert async_get_feed(hass, API_URL, "other") is not feed
+    assert async_get_feed(hass, "https://other/timetagger", "token") is not feed
+
+
+async def test_updates_shared_between_entries(
+    hass: HomeAssistant, mock_aiohttp_session
+) -> None:
+    """Test one updates request serves every entry with its own tags."""
+    work = _coordinator(hass, "#work")
+    home = _coordinator(hass, "#home", API_URL + "/")
+    other = _coordinator(hass, "#work", token="other")
+    now = time.time()
+    _updates(
+        mock_aiohttp_session,
+        [
+            {"key": "a", "t1": now - 3600, "t2": now, "mt": 1, "ds": "#work"},
+            {"key": "b", "t1": now - 1800, "t2": now, "mt": 1, "ds": "#home"},
+        ],
+    )
+
+    await work._async_update_data()
+    await hass.async_block_till_done()
+
+    assert mock_aiohttp_session.get.call_count == 1
+    assert [r.key for r in work._store.records()] == ["a"]
+    # The other entry of the account is updated without a request
+    assert [r.key for r in home._store.records()] == ["b"]
+    assert home.data.today_records == 1
+    assert home.updates_cursor == 2000.0
+    assert home.diagnostics()["feed_entries"] == 2
+    # Another token is another account
+    assert len(other._store) == 0
+    assert other.updates_cursor == 1000.0
+
+    for coordinator in (work, home, other):
+        await coordinator.async_shutdown()
+
+
+async def test_updates_since_oldest_cursor(
+    hass: HomeAssistant, mock_aiohttp_session
+) -> None:
+    """Test the shared request starts at the cursor of the furthest behind."""
+    work = _coordinator(hass, "#work")
+    home = _coordinator(hass, "#home")
+    home._store.server_time = 900.0
+    _updates(mock_aiohttp_session, [])
+
+    await work._async_update_data()
+    await hass.async_block_till_done()
+
+    assert mock_aiohttp_session.get.call_args.kwargs["params"] == {"since": 900.0}
+    assert work.updates_cursor == home.updates_cursor == 2000.0
+
+    # An unsubscribed entry no longer holds the cursor back
+    await home.async_shutdown()
+    home._store.server_time = 100.0
+    await work._async_update_data()
+
+    assert mock_aiohttp_session.get.call_args.kwargs["params"] == {"since": 2000.0}
+    await work.async_shutdown()
+
+
+async def test_concurrent_refreshes_share_request(
+    hass: HomeAssistant, mock_aiohttp_session
+) -> None:
+    """Test refreshes during a request in flight wait for its response."""
+    coordinators = [_coordinator(hass, tags) for tags in ("#work", "#home", "")]
+    response = mock_aiohttp_session.get.return_value.__aenter__.return_value
+
+    async def slow_json(**kwargs) -> dict:
+        await asyncio.sleep(0)
+        return {"server_time": 2000.0, "records": []}
+
+    response.json.side_effect = slow_json
+
+    await asyncio.gather(
+        *(coordinator._async_update_data() for coordinator in coordinators)
+    )
+
+    assert mock_aiohttp_session.get.call_count == 1
+    assert [c.metrics.last.requests for c in coordinators] == [1, 0, 0]
+
+    for coordinator in coordinators:
+        await coordinator.async_shutdown()
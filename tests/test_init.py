@@ -11,6 +11,7 @@ from homeassistant.const import Platform
 from custom_components.timetagger import (
     async_setup_entry,
     async_unload_entry,
+    async_remove_entry,
     PLATFORMS,
 )
 from custom_components.timetagger.const import DOMAIN
@@ -42,6 +43,32 @@ async def test_async_setup_entry(
         mock_forward.assert_called_once_with(mock_config_entry, PLATFORMS)
 
 
+async def test_async_setup_entry_from_cache(
+    hass: HomeAssistant,
+    mock_config_entry: ConfigEntry,
+) -> None:
+    """Test setup publishes cached data and refreshes in the background."""
+    with patch(
+        "custom_components.timetagger.TimeTaggerCoordinator.async_load_cache",
+        return_value=True,
+    ), patch(
+        "custom_components.timetagger.TimeTaggerCoordinator.async_refresh"
+    ) as mock_background_refresh, patch(
+        "custom_components.timetagger.TimeTaggerCoordinator.async_config_entry_first_refresh"
+    ) as mock_refresh, patch(
+        "homeassistant.config_entries.ConfigEntries.async_forward_entry_setups"
+    ) as mock_forward:
+        mock_forward.return_value = True
+
+        result = await async_setup_entry(hass, mock_config_entry)
+        await hass.async_block_till_done()
+
+        assert result is True
+        mock_refresh.assert_not_called()
+        mock_background_refresh.assert_called_once()
+        mock_forward.assert_called_once_with(mock_config_entry, PLATFORMS)
+
+
 async def test_async_setup_entry_coordinator_failure(
     hass: HomeAssistant,
     mock_config_entry: ConfigEntry,
@@ -49,12 +76,17 @@ async def test_async_setup_entry_coordinator_failure(
     """Test setup entry with coordinator failure."""
     with patch(
         "custom_components.timetagger.TimeTaggerCoordinator.async_config_entry_first_refresh"
-    ) as mock_refresh:
+    ) as mock_refresh, patch(
+        "custom_components.timetagger.TimeTaggerCoordinator.async_shutdown"
+    ) as mock_shutdown:
         mock_refresh.side_effect = Exception("API Error")
         
         with pytest.raises(Exception, match="API Error"):
             await async_setup_entry(hass, mock_config_entry)
 
+        # The coordinator no longer shares the updates of the account
+        mock_shutdown.assert_called_once()
+
 
 async def test_async_unload_entry_success(
     hass: HomeAssistant,
@@ -114,6 +146,23 @@ async def test_async_unload_entry_no_domain_data(
         mock_unload.assert_called_once_with(mock_config_entry, PLATFORMS)
 
 
+async def test_async_remove_entry(
+    hass: HomeAssistant,
+    mock_config_entry: ConfigEntry,
+    hass_storage,
+) -> None:
+    """Test removing an entry deletes its record cache."""
+    hass_storage[f"{DOMAIN}.{mock_config_entry.entry_id}"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.{mock_config_entry.entry_id}",
+        "data": {},
+    }
+
+    await async_remove_entry(hass, mock_config_entry)
+
+    assert f"{DOMAIN}.{mock_config_entry.entry_id}" not in hass_storage
+
+
 def test_platforms() -> None:
     """Test that platforms are correctly defined."""
     assert PLATFORMS == [Platform.SENSOR]
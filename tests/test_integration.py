@@ -11,6 +11,8 @@ from homeassistant.const import Platform
 
 from custom_components.timetagger.const import DOMAIN
 
+from .conftest import MockStreamReader
+
 
 async def test_full_integration_setup(
     hass: HomeAssistant,
@@ -21,52 +23,87 @@ async def test_full_integration_setup(
     # Mock successful API responses
     mock_response = AsyncMock()
     mock_response.status = 200
-    mock_response.json.return_value = {
-        "records": [
-            {"t1": 1640995200, "t2": 1641024000},  # 8 hours
-            {"t1": 1641027600, "t2": 1641031200},  # 1 hour
-        ]
-    }
-    mock_aiohttp_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
-    
-    with patch("aiohttp.ClientSession", mock_aiohttp_session):
-        # Add the config entry
-        mock_config_entry.add_to_hass(hass)
-        
-        # Set up the integration
-        assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
-        await hass.async_block_till_done()
-        
-        # Check that the domain is loaded
-        assert DOMAIN in hass.data
-        
-        # Check that the coordinator is created
-        assert mock_config_entry.entry_id in hass.data[DOMAIN]
-        
-        # Check that sensors are created
-        entity_registry = er.async_get(hass)
-        entities = er.async_entries_for_config_entry(
-            entity_registry, mock_config_entry.entry_id
-        )
-        
-        # Should have 5 sensor entities
-        assert len(entities) == 5
-        
-        # Check entity unique IDs
-        expected_unique_ids = {
-            "timetagger_work_today",
-            "timetagger_work_week", 
-            "timetagger_work_month",
-            "timetagger_remaining_week",
-            "timetagger_monthly_balance",
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader(
+        {
+            "records": [
+                {"key": "a", "t1": 1640995200, "t2": 1641024000},  # 8 hours
+                {"key": "b", "t1": 1641027600, "t2": 1641031200},  # 1 hour
+            ]
         }
-        
-        actual_unique_ids = {entity.unique_id for entity in entities}
-        assert actual_unique_ids == expected_unique_ids
-        
-        # Check that all entities are sensor platform
-        for entity in entities:
-            assert entity.platform == Platform.SENSOR.value
+    )
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+    
+    # Add the config entry
+    mock_config_entry.add_to_hass(hass)
+
+    # Set up the integration
+    assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # Check that the domain is loaded
+    assert DOMAIN in hass.data
+
+    # Check that the coordinator is created
+    assert mock_config_entry.entry_id in hass.data[DOMAIN]
+
+    # Check that sensors are created
+    entity_registry = er.async_get(hass)
+    entities = er.async_entries_for_config_entry(
+        entity_registry, mock_config_entry.entry_id
+    )
+
+    # Should have 6 sensor entities, the diagnostic one disabled by default
+    assert len(entities) == 6
+
+    # Check entity unique IDs
+    expected_unique_ids = {
+        "test_entry_id_timetagger_work_today",
+        "test_entry_id_timetagger_work_week",
+        "test_entry_id_timetagger_work_month",
+        "test_entry_id_timetagger_remaining_week",
+        "test_entry_id_timetagger_monthly_balance",
+        "test_entry_id_timetagger_refresh_duration",
+    }
+
+    actual_unique_ids = {entity.unique_id for entity in entities}
+    assert actual_unique_ids == expected_unique_ids
+
+    # Check that all entities are sensor platform
+    for entity in entities:
+        assert entity.platform == Platform.SENSOR.value
+
+
+async def test_unique_ids_migrated(
+    hass: HomeAssistant,
+    mock_config_entry: ConfigEntry,
+    mock_aiohttp_session,
+) -> None:
+    """Test sensors of older versions get the config entry in their unique id."""
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader({"records": []})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
+    mock_config_entry.add_to_hass(hass)
+    entity_registry = er.async_get(hass)
+    old = entity_registry.async_get_or_create(
+        Platform.SENSOR,
+        DOMAIN,
+        "timetagger_work_today",
+        config_entry=mock_config_entry,
+        suggested_object_id="timetagger_working_hours_today",
+    )
+
+    assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    migrated = entity_registry.async_get(old.entity_id)
+    assert migrated.unique_id == "test_entry_id_timetagger_work_today"
+    entities = er.async_entries_for_config_entry(
+        entity_registry, mock_config_entry.entry_id
+    )
+    assert len(entities) == 6
 
 
 async def test_integration_unload(
@@ -78,25 +115,25 @@ async def test_integration_unload(
     # First set up the integration
     mock_response = AsyncMock()
     mock_response.status = 200
-    mock_response.json.return_value = {"records": []}
-    mock_aiohttp_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
+    mock_response.json.return_value = {"server_time": 1641031200.5, "records": []}
+    mock_response.content = MockStreamReader({"records": []})
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
     
-    with patch("aiohttp.ClientSession", mock_aiohttp_session):
-        mock_config_entry.add_to_hass(hass)
-        assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
-        await hass.async_block_till_done()
-        
-        # Verify setup worked
-        assert DOMAIN in hass.data
-        assert mock_config_entry.entry_id in hass.data[DOMAIN]
-        
-        # Now unload
-        assert await hass.config_entries.async_unload(mock_config_entry.entry_id)
-        await hass.async_block_till_done()
-        
-        # Verify unload worked
-        if DOMAIN in hass.data:
-            assert mock_config_entry.entry_id not in hass.data[DOMAIN]
+    mock_config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # Verify setup worked
+    assert DOMAIN in hass.data
+    assert mock_config_entry.entry_id in hass.data[DOMAIN]
+
+    # Now unload
+    assert await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # Verify unload worked
+    if DOMAIN in hass.data:
+        assert mock_config_entry.entry_id not in hass.data[DOMAIN]
 
 
 async def test_integration_coordinator_update_failure(
@@ -109,13 +146,12 @@ async def test_integration_coordinator_update_failure(
     mock_response = AsyncMock()
     mock_response.status = 401
     mock_response.text.return_value = "Unauthorized"
-    mock_aiohttp_session.return_value.__aenter__.return_value.get.return_value.__aenter__.return_value = mock_response
+    mock_aiohttp_session.get.return_value.__aenter__.return_value = mock_response
     
-    with patch("aiohttp.ClientSession", mock_aiohttp_session):
-        mock_config_entry.add_to_hass(hass)
-        
-        # Setup should fail due to coordinator first refresh failure
-        assert not await hass.config_entries.async_setup(mock_config_entry.entry_id)
-        
-        # Domain should still be in data but entry should not be there
-        assert mock_config_entry.entry_id not in hass.data.get(DOMAIN, {})
\ No newline at end of file
+    mock_config_entry.add_to_hass(hass)
+
+    # Setup should fail due to coordinator first refresh failure
+    assert not await hass.config_entries.async_setup(mock_config_entry.entry_id)
+
+    # Domain should still be in data but entry should not be there
+    assert mock_config_entry.entry_id not in hass.data.get(DOMAIN, {})
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""Test TimeTagger refresh metrics."""
+from __future__ import annotations
+
+from custom_components.timetagger.metrics import FetchMetrics, RefreshSample
+
+
+def test_rolling_window() -> None:
+    """Test only the latest refreshes count towards the percentiles."""
+    metrics = FetchMetrics(window=3)
+    for total in (10.0, 1.0, 2.0, 3.0):
+        metrics.add(RefreshSample(total=total, requests=1, bytes=100))
+
+    assert metrics.refreshes == 4
+    assert metrics.total_requests == 4
+    assert metrics.total_bytes == 400
+    assert metrics.last.total == 3.0
+    assert metrics.percentiles()["total"] == {"p50": 2.0, "p95": 3.0, "max": 3.0}
+
+
+def test_errors_and_diagnostics() -> None:
+    """Test errors are counted by type and all metrics are exported."""
+    metrics = FetchMetrics()
+    assert metrics.percentiles() == {}
+    assert metrics.as_dict()["last"] is None
+
+    metrics.add_error(TimeoutError())
+    metrics.add_error(TimeoutError())
+    metrics.add_error(ValueError())
+    metrics.add(RefreshSample(request=0.1, decode=0.2, records=5))
+
+    data = metrics.as_dict()
+    assert data["errors"] == {"TimeoutError": 2, "ValueError": 1}
+    assert data["last"]["records"] == 5
+    assert data["percentiles"]["decode"]["p95"] == 0.2
+    assert data["window"] == 1
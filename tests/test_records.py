@@ -0,0 +1,500 @@
+"""Test TimeTagger record store."""
+from __future__ import annotations
+
+import json
+import tracemalloc
+
+import pytest
+
+from custom_components.timetagger.records import (
+    IntervalIndex,
+    Record,
+    RecordStore,
+    RecordStreamDecoder,
+    TagFilter,
+    TagGroups,
+    _parse_tags,
+    parse_tag_groups,
+)
+
+
+def _record(key: str, t1: float, t2: float, ds: str = "#work", mt: float = 1) -> dict:
+    return {"key": key, "t1": t1, "t2": t2, "ds": ds, "mt": mt}
+
+
+def test_parse_tags() -> None:
+    """Test tags are parsed case-insensitively from descriptions."""
+    assert _parse_tags("Meeting #Work #client-a") == {"#work", "#client-a"}
+    assert _parse_tags("#work,#home") == {"#work", "#home"}
+    assert _parse_tags("") == frozenset()
+
+
+def test_record_from_api() -> None:
+    """Test API records are converted into the compact form."""
+    record = Record.from_api(
+        {"key": "a", "t1": "100", "t2": 200, "mt": 5, "st": 6, "ds": "Call #Work"}
+    )
+
+    assert record == Record("a", 100.0, 200.0, 5.0, frozenset({"#work"}))
+    assert record.as_dict() == {
+        "key": "a",
+        "t1": 100.0,
+        "t2": 200.0,
+        "mt": 5.0,
+        "ds": "#work",
+    }
+    assert not hasattr(record, "__dict__")
+
+
+def test_record_tags_are_shared() -> None:
+    """Test records with the same tags share one tag set."""
+    first = Record.from_api({"key": "a", "ds": "Review #work #client"})
+    second = Record.from_api({"key": "b", "ds": "#client #WORK call"})
+
+    assert first.tags is second.tags
+
+
+def test_reset_filters_records() -> None:
+    """Test seeding drops hidden, running, untagged and old records."""
+    store = RecordStore("#work")
+    store.reset(
+        [
+            _record("a", 100, 200),
+            _record("b", 100, 200, ds="HIDDEN #work"),
+            _record("c", 150, 150),
+            _record("d", 100, 200, ds="#home"),
+            _record("e", 10, 50),
+        ],
+        server_time=1000,
+        start=60,
+    )
+
+    assert [r.key for r in store.records()] == ["a"]
+    assert store.server_time == 1000
+    assert store.covers(60)
+    assert store.covers(100)
+    assert not store.covers(50)
+
+
+def test_apply_changes() -> None:
+    """Test inserts, edits, deletions and stale edits are applied by mt."""
+    store = RecordStore("#work")
+    store.reset([_record("a", 100, 200), _record("b", 300, 400)], 1000, 0)
+
+    changed = store.apply(
+        [
+            _record("a", 100, 250, mt=2),  # edit
+            _record("b", 300, 400, ds="HIDDEN #work", mt=2),  # deletion
+            _record("c", 500, 600, mt=2),  # insert
+            _record("d", 500, 600, ds="#home", mt=2),  # other tags
+        ]
+    )
+
+    assert changed == 3
+    assert [(r.key, r.t2) for r in store.records()] == [("a", 250), ("c", 600)]
+
+    # An older version of a record does not overwrite the stored one
+    assert store.apply([_record("a", 100, 200, mt=1)]) == 0
+    assert store.records()[0].t2 == 250
+
+    # Applying the same versions again, e.g. from a shared feed, is no change
+    assert store.apply([_record("a", 100, 250, mt=2), _record("r", 700, 700)]) == 1
+    assert store.apply([_record("a", 100, 250, mt=2), _record("r", 700, 700)]) == 0
+
+
+def test_prune() -> None:
+    """Test moving the window start drops records that ended before it."""
+    store = RecordStore("")
+    store.reset([_record("a", 100, 200), _record("b", 300, 400)], 1000, 0)
+
+    store.prune(250)
+
+    assert [r.key for r in store.records()] == ["b"]
+    assert len(store) == 1
+    assert store.start == 250
+
+
+def test_cache_round_trip() -> None:
+    """Test the store can be restored from its cached form."""
+    store = RecordStore("#work")
+    store.reset([_record("a", 100, 200)], 1000, 50)
+
+    restored = RecordStore("#work")
+    assert restored.restore(store.as_dict())
+    assert restored.records() == store.records()
+    assert restored.server_time == 1000
+    assert restored.start == 50
+
+    assert not RecordStore("#home").restore(store.as_dict())
+    assert not RecordStore("#work").restore({})
+
+
+@pytest.mark.parametrize(
+    "start,end,expected",
+    [
+        (0, 1000, 250),  # everything
+        (100, 200, 100),  # exactly the first interval
+        (150, 250, 50),  # gap after the first interval
+        (150, 350, 100),  # across a gap
+        (320, 330, 10),  # inside the merged interval
+        (600, 700, 0),  # after the last interval
+        (200, 300, 0),  # exactly the gap
+        (700, 600, 0),  # empty range
+        (330, 320, 0),  # empty range inside the merged interval
+    ],
+)
+def test_interval_index_seconds_between(start, end, expected) -> None:
+    """Test range queries over merged intervals."""
+    # 300-400 and 350-450 overlap and are merged into 300-450
+    index = IntervalIndex([(100, 200), (300, 400), (350, 450), (500, 500)])
+
+    assert len(index) == 2
+    assert index.seconds_between(start, end) == expected
+
+
+@pytest.mark.parametrize(
+    "intervals,expected_hours",
+    [
+        ([], 0.0),
+        ([(1640995200, 1641024000)], 8.0),  # 8 hours
+        ([(1640995200, 1641024000), (1641027600, 1641031200)], 9.0),  # 8h + 1h
+        ([(1640995200, 1641024000), (1640995200, 1641024000)], 8.0),  # Duplicate
+        ([(1640995200, 1641024000), (1641020400, 1641027600)], 9.0),  # Overlap
+        ([(1640995200, 1641024000), (1640998800, 1641002400)], 8.0),  # Contained
+        ([(1641031200, 1640995200)], 0.0),  # Negative time (should be 0)
+        ([(0, 0)], 0.0),  # Zero time
+    ],
+)
+def test_interval_index_union(intervals, expected_hours) -> None:
+    """Test overlapping and duplicated intervals are only counted once."""
+    index = IntervalIndex(intervals)
+
+    assert index.hours_between(0, 2000000000) == expected_hours
+
+
+def test_interval_index_hours_between() -> None:
+    """Test hours are rounded like the period totals."""
+    index = IntervalIndex([(0, 3600), (1800, 7200), (7200, 10800)])
+
+    assert len(index) == 1
+    assert index.hours_between(0, 10800) == 3.0
+    assert index.hours_between(600, 1200) == 0.17
+
+
+def test_store_index_invalidation() -> None:
+    """Test the store rebuilds its index only after changes."""
+    store = RecordStore("")
+    store.reset([_record("a", 0, 3600)], 1000, 0)
+
+    index = store.index()
+    assert store.index() is index
+    assert index.hours_between(0, 7200) == 1.0
+
+    store.apply([_record("b", 3600, 7200, mt=2)])
+    assert store.index() is not index
+    assert store.index().hours_between(0, 7200) == 2.0
+
+    index = store.index()
+    store.prune(3600)
+    assert store.index() is not index
+    assert store.index().hours_between(0, 7200) == 1.0
+
+
+def test_store_incremental_order() -> None:
+    """Test edits keep the entries sorted without a full rebuild."""
+    store = RecordStore("")
+    store.reset(
+        [_record("a", 100, 200), _record("b", 300, 400), _record("c", 500, 600)],
+        1000,
+        0,
+    )
+
+    # Move "c" before "a", edit "b" twice in one batch and delete "a"
+    store.apply(
+        [
+            _record("c", 0, 50, mt=2),
+            _record("b", 300, 450, mt=2),
+            _record("b", 300, 500, mt=3),
+            _record("a", 100, 200, ds="HIDDEN", mt=2),
+        ]
+    )
+
+    assert store._entries() == [(0, 50, "c"), (300, 500, "b")]
+    assert [r.key for r in store.records()] == ["c", "b"]
+    assert store.index().seconds_between(0, 1000) == 250
+    assert store.count_between(0, 100) == 1
+    assert store.count_between(40, 350) == 2
+    assert store.count_between(500, 600) == 0
+
+
+def test_store_bulk_apply() -> None:
+    """Test large batches rebuild the sorted entries in one go."""
+    store = RecordStore("")
+    records = [_record(f"r{i}", 1000 - i * 10, 1005 - i * 10) for i in range(100)]
+
+    store.reset(records, 1000, 0)
+
+    assert store._sorted is None
+    assert store._entries() == sorted(store._entries())
+    assert len(store) == 100
+    assert store.index().seconds_between(0, 2000) == 500
+
+
+def test_store_prepare_and_copy() -> None:
+    """Test a prepared copy is changed without touching the original."""
+    store = RecordStore("")
+    store.reset(
+        [_record(f"r{i}", 1000 - i * 10, 1005 - i * 10) for i in range(100)], 1000, 0
+    )
+    store.apply([_record("run", 2000, 2000)])
+
+    store.prepare()
+    assert store._sorted is not None
+    index = store._indexes[0]
+
+    clone = store.copy()
+    clone.apply([_record("r0", 1000, 1100, mt=2), _record("run", 2000, 2100, mt=2)])
+    clone.prepare()
+
+    assert store.index() is index
+    assert store.index().seconds_between(0, 3000) == 500
+    assert [r.key for r in store.running] == ["run"]
+    assert clone.index().seconds_between(0, 3000) == 695
+    assert clone.running == []
+    assert len(clone) == 101
+
+
+def test_store_running_records() -> None:
+    """Test running timers are tracked apart from finished records."""
+    store = RecordStore("#work")
+    store.reset([_record("a", 100, 200), _record("b", 300, 300)], 1000, 250)
+
+    # A timer started before the window start is still running
+    assert [r.key for r in store.running] == ["b"]
+    assert [r.key for r in store.records()] == []
+
+    # Stopping the timer moves it to the finished records
+    assert store.apply([_record("b", 300, 400, mt=2)]) == 1
+    assert store.running == []
+    assert [r.key for r in store.records()] == ["b"]
+
+    # Starting and deleting timers count as changes
+    assert store.apply([_record("c", 500, 500, mt=2)]) == 1
+    assert store.apply([_record("c", 500, 500, ds="HIDDEN #work", mt=3)]) == 1
+    assert store.running == []
+
+    # Running timers survive the on-disk cache
+    store.apply([_record("d", 600, 600, mt=4)])
+    restored = RecordStore("#work")
+    assert restored.restore(store.as_dict())
+    assert [r.key for r in restored.running] == ["d"]
+
+
+def test_store_hours_with_running_timers() -> None:
+    """Test running timers count up to now without double counting."""
+    store = RecordStore("")
+    store.reset(
+        [_record("a", 0, 3600), _record("b", 1800, 1800), _record("c", 5400, 5400)],
+        1000,
+        0,
+    )
+
+    assert store.hours_between(0, 7200) == 1.0
+    # "b" runs from 1800, half of it overlaps the finished record "a"
+    assert store.hours_between(0, 7200, now=5400) == 1.5
+    assert store.hours_between(0, 7200, now=7200) == 2.0
+    assert store.hours_between(3600, 7200, now=7200) == 1.0
+    # now before the range start adds nothing
+    assert store.hours_between(3600, 7200, now=1000) == 0.0
+
+
+@pytest.mark.parametrize("loads", [None, json.loads])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+def test_stream_decoder(chunk_size, loads) -> None:
+    """Test records are decoded from chunks split at any position."""
+    records = [
+        _record("a", 100, 200, ds="Caf\u00e9 #work, [draft]"),
+        _record("b", 300, 400, ds='Quote " and } #work'),
+        _record("c", 500, 500, ds='{"key": "x"}, {'),
+        _record("d", 600, 700),
+    ]
+    body = json.dumps({"records": records}, ensure_ascii=False).encode()
+
+    decoder = RecordStreamDecoder(loads)
+    decoded = []
+    for pos in range(0, len(body), chunk_size):
+        decoded += decoder.feed(body[pos : pos + chunk_size])
+
+    assert decoded == records
+    assert decoder.done
+
+
+def test_stream_decoder_incomplete() -> None:
+    """Test a truncated body is not reported as done."""
+    decoder = RecordStreamDecoder()
+
+    assert decoder.feed(b'{"records": [{"key": "a", "t1": 1') == []
+    assert not decoder.done
+    assert decoder.feed(b"") == []
+    assert not decoder.done
+
+
+def test_stream_decoder_memory() -> None:
+    """Test peak memory is bounded by the chunk size, not the body size."""
+    body = json.dumps(
+        {"records": [_record(f"r{i}", i, i + 1, ds="x" * 100) for i in range(20000)]}
+    ).encode()
+    decoder = RecordStreamDecoder()
+
+    tracemalloc.start()
+    try:
+        for pos in range(0, len(body), 65536):
+            decoder.feed(body[pos : pos + 65536])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert decoder.done
+    assert peak < len(body) / 4
+
+
+def test_store_streamed_seed() -> None:
+    """Test a seed applied in batches is sorted once when read."""
+    store = RecordStore("")
+    store.reset([], 1000, 0)
+    store.apply([_record("b", 300, 400), _record("c", 500, 600)])
+    store.apply([_record("a", 100, 200)])
+
+    assert store._sorted is None
+    assert [r.key for r in store.records()] == ["a", "b", "c"]
+    assert store.index().seconds_between(0, 1000) == 300
+
+
+def test_tag_filter() -> None:
+    """Test all, any and exclude conditions of a tag filter."""
+    tag_filter = TagFilter.parse("#Work #client-a|#client-b, -#private")
+
+    assert tag_filter == TagFilter(
+        frozenset({"#work"}),
+        (frozenset({"#client-a", "#client-b"}),),
+        frozenset({"#private"}),
+    )
+    assert str(tag_filter) == "#work #client-a|#client-b -#private"
+    assert tag_filter.matches(frozenset({"#work", "#client-b"}))
+    assert not tag_filter.matches(frozenset({"#work"}))
+    assert not tag_filter.matches(frozenset({"#client-a"}))
+    assert not tag_filter.matches(frozenset({"#work", "#client-a", "#private"}))
+    assert TagFilter.parse("").matches(frozenset())
+
+    with pytest.raises(ValueError):
+        TagFilter.parse("#work meeting")
+
+
+@pytest.mark.parametrize(
+    "value", ["#meeting", "Meetings: #meeting; Meetings: #call", ": #work"]
+)
+def test_parse_tag_groups_invalid(value: str) -> None:
+    """Test tag groups need a unique name."""
+    with pytest.raises(ValueError):
+        parse_tag_groups(value)
+
+
+def test_parse_tag_groups() -> None:
+    """Test tag groups are parsed by name in order."""
+    groups = parse_tag_groups("Meetings: #meeting; On-call: #oncall -#private;")
+
+    assert list(groups) == ["Meetings", "On-call"]
+    assert groups["On-call"] == TagFilter.parse("#oncall -#private")
+    assert parse_tag_groups("") == {}
+
+
+def test_tag_groups_match_once_per_tag_set() -> None:
+    """Test each distinct tag set is matched against the filters once."""
+    groups = TagGroups([TagFilter.parse("#work"), TagFilter.parse("#meeting")])
+    records = [
+        Record.from_api({"key": str(i), "t1": i * 10, "t2": i * 10 + 5, "ds": ds})
+        for i, ds in enumerate(["#work", "#work #meeting", "#meeting", "#home"])
+    ]
+
+    work, meeting = groups.indexes(records)
+
+    assert work.seconds_between(0, 100) == 10
+    assert meeting.seconds_between(0, 100) == 10
+    assert len(groups._matches) == 4
+    assert groups.matches(records[1].tags) == (0, 1)
+    assert groups.required == frozenset()
+
+
+def test_store_with_tag_groups() -> None:
+    """Test a store keeps the records of every group and splits the totals."""
+    groups = parse_tag_groups("Meetings: #meeting; On-call: #oncall -#private")
+    store = RecordStore("#work", groups)
+    store.reset(
+        [
+            _record("a", 0, 3600),
+            _record("b", 3600, 5400, ds="#work #meeting"),
+            _record("c", 7200, 9000, ds="#oncall"),
+            _record("d", 9000, 10800, ds="#oncall #private"),
+            _record("e", 10800, 10800, ds="#oncall"),
+        ],
+        1000,
+        0,
+    )
+
+    assert store.groups == ["Meetings", "On-call"]
+    assert store.query_tags == ""
+    assert [r.key for r in store.records()] == ["a", "b", "c"]
+    assert store.hours_between(0, 20000) == 1.5
+    assert store.hours_between(0, 20000, group="Meetings") == 0.5
+    assert store.hours_between(0, 20000, 14400, group="On-call") == 1.5
+    assert store.count_between(0, 20000) == 2
+    assert store.count_between(0, 20000, "On-call") == 1
+
+    restored = RecordStore("#work", groups)
+    assert restored.restore(store.as_dict())
+    assert restored.hours_between(0, 20000, group="Meetings") == 0.5
+    assert not RecordStore("#work").restore(store.as_dict())
+
+
+def test_store_tag_edit_updates_groups() -> None:
+    """Test editing only the tags of a record moves it between the groups."""
+    store = RecordStore("#work", parse_tag_groups("Meet: #meeting"))
+    store.reset([_record("a", 0, 3600, ds="#work #meeting")], 1000, 0)
+    assert store.hours_between(0, 3600, group="Meet") == 1.0
+
+    assert store.apply([_record("a", 0, 3600, ds="#work #dev", mt=2)]) == 1
+    assert store.hours_between(0, 3600, group="Meet") == 0
+    assert store.hours_between(0, 3600) == 1.0
+
+
+def test_store_query_tags() -> None:
+    """Test the server filter only uses the tags every group requires."""
+    assert RecordStore("#Work,#home").query_tags == "#home,#work"
+    groups = parse_tag_groups("Meetings: #work #meeting")
+    assert RecordStore("#work,#home", groups).query_tags == "#work"
+
+
+def test_tag_totals() -> None:
+    """Test the hours per tag are summed per period in one pass."""
+    store = RecordStore("#work", parse_tag_groups("Private: #private"))
+    store.reset(
+        [
+            _record("a", 0, 3600, ds="#work #client-a"),
+            _record("b", 1800, 5400, ds="#work #client-a #call"),
+            _record("c", 7200, 9000, ds="#work #client-b"),
+            _record("d", 9000, 9000, ds="#work #call"),
+            _record("e", 0, 9000, ds="#private #client-a"),
+        ],
+        1000,
+        0,
+    )
+
+    totals = store.tag_totals((0, 3600), 10800, 9900)
+
+    assert totals == {
+        # Overlapping records of a tag are counted once
+        "#call": [(1.25, 2), (0.75, 2)],
+        "#client-a": [(1.5, 2), (0.5, 1)],
+        "#client-b": [(0.5, 1), (0.5, 1)],
+    }
+    assert store.tag_totals((0,), 10800, 9900).keys() == totals.keys()
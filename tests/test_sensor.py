@@ -1,24 +1,35 @@
 """Test TimeTagger sensors."""
 from __future__ import annotations
 
-from datetime import datetime
-from unittest.mock import patch
+from dataclasses import replace
+from unittest.mock import MagicMock, patch
+
 import pytest
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from custom_components.timetagger.sensor import (
     async_setup_entry,
-    _sum_hours,
     TTWorkToday,
     TTWorkWeek,
     TTWorkMonth,
     TTRemainingWeek,
     TTMonthlyBalance,
+    TTRefreshDuration,
+    TTTagGroupWeek,
+    TTTagWeek,
+)
+from custom_components.timetagger.const import (
+    CONF_TAG_BREAKDOWN,
+    CONF_WORK_TAGS,
+    DOMAIN,
 )
-from custom_components.timetagger.const import DOMAIN
+from custom_components.timetagger.coordinator import GroupHours
+from custom_components.timetagger.metrics import FetchMetrics, RefreshSample
+from custom_components.timetagger.records import parse_tag_groups
 
 
 async def test_async_setup_entry(
@@ -37,37 +48,13 @@ async def test_async_setup_entry(
     
     await async_setup_entry(hass, mock_config_entry, mock_add_entities)
     
-    assert len(entities) == 5
+    assert len(entities) == 6
     assert isinstance(entities[0], TTWorkToday)
     assert isinstance(entities[1], TTWorkWeek)
     assert isinstance(entities[2], TTWorkMonth)
     assert isinstance(entities[3], TTRemainingWeek)
     assert isinstance(entities[4], TTMonthlyBalance)
-
-
-@pytest.mark.parametrize(
-    "records,expected_hours",
-    [
-        ([], 0.0),
-        ([{"t1": 1640995200, "t2": 1641024000}], 8.0),  # 8 hours
-        ([{"t1": 1640995200, "t2": 1641027600}], 9.0),  # 9 hours
-        (
-            [
-                {"t1": 1640995200, "t2": 1641024000},  # 8 hours
-                {"t1": 1641027600, "t2": 1641031200},  # 1 hour
-            ],
-            9.0,
-        ),
-        ([{"t1": 1641031200, "t2": 1640995200}], 0.0),  # Negative time (should be 0)
-        ([{"t1": 0, "t2": 0}], 0.0),  # Zero time
-        ([{"t1": None, "t2": 1641024000}], 8.0),  # Missing t1
-        ([{"t1": 1640995200, "t2": None}], 0.0),  # Missing t2
-    ],
-)
-def test_sum_hours(records, expected_hours) -> None:
-    """Test _sum_hours function."""
-    result = _sum_hours(records)
-    assert result == expected_hours
+    assert isinstance(entities[5], TTRefreshDuration)
 
 
 class TestTTWorkToday:
@@ -78,7 +65,7 @@ class TestTTWorkToday:
         sensor = TTWorkToday(mock_coordinator, mock_config_entry)
         
         assert sensor._attr_name == "Working hours today"
-        assert sensor._attr_unique_id == "timetagger_work_today"
+        assert sensor._attr_unique_id == "test_entry_id_timetagger_work_today"
         assert sensor._attr_native_unit_of_measurement == "h"
         assert sensor._attr_has_entity_name is True
 
@@ -108,7 +95,7 @@ class TestTTWorkWeek:
         sensor = TTWorkWeek(mock_coordinator, mock_config_entry)
         
         assert sensor._attr_name == "Working hours this week"
-        assert sensor._attr_unique_id == "timetagger_work_week"
+        assert sensor._attr_unique_id == "test_entry_id_timetagger_work_week"
         assert sensor._attr_native_unit_of_measurement == "h"
 
     def test_native_value(self, mock_coordinator, mock_config_entry) -> None:
@@ -127,7 +114,7 @@ class TestTTWorkMonth:
         sensor = TTWorkMonth(mock_coordinator, mock_config_entry)
         
         assert sensor._attr_name == "Working hours this month"
-        assert sensor._attr_unique_id == "timetagger_work_month"
+        assert sensor._attr_unique_id == "test_entry_id_timetagger_work_month"
         assert sensor._attr_native_unit_of_measurement == "h"
 
     def test_native_value(self, mock_coordinator, mock_config_entry) -> None:
@@ -143,105 +130,254 @@ class TestTTRemainingWeek:
 
     def test_attributes(self, mock_coordinator, mock_config_entry) -> None:
         """Test sensor attributes."""
-        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry, 8.0)
+        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry)
         
         assert sensor._attr_name == "Remaining time this week"
-        assert sensor._attr_unique_id == "timetagger_remaining_week"
+        assert sensor._attr_unique_id == "test_entry_id_timetagger_remaining_week"
         assert sensor._attr_native_unit_of_measurement == "h"
-        assert sensor._daily_target == 8.0
-
-    @patch("custom_components.timetagger.sensor.datetime")
-    def test_week_target(self, mock_datetime, mock_coordinator, mock_config_entry) -> None:
-        """Test week target calculation."""
-        # Mock Monday (weekday = 0)
-        mock_datetime.now.return_value.weekday.return_value = 0
-        
-        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry, 8.0)
-        assert sensor._week_target() == 8.0  # 1 day * 8 hours
-        
-        # Mock Friday (weekday = 4)
-        mock_datetime.now.return_value.weekday.return_value = 4
-        assert sensor._week_target() == 40.0  # 5 days * 8 hours
-        
-        # Mock Saturday (weekday = 5) - should still be 5 days max
-        mock_datetime.now.return_value.weekday.return_value = 5
-        assert sensor._week_target() == 40.0  # 5 days * 8 hours (capped)
 
-    @patch("custom_components.timetagger.sensor.datetime")
-    def test_native_value(self, mock_datetime, mock_coordinator, mock_config_entry) -> None:
+    def test_native_value(self, mock_coordinator, mock_config_entry) -> None:
         """Test native value calculation."""
-        # Mock Wednesday (weekday = 2)
-        mock_datetime.now.return_value.weekday.return_value = 2
-        
-        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry, 8.0)
+        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry)
         
         # Target: 3 days * 8 hours = 24h
         # Worked: 17h (from mock data)
         # Remaining: 24h - 17h = 7h
         assert sensor.native_value == 7.0
 
-    @patch("custom_components.timetagger.sensor.datetime")
-    def test_extra_state_attributes(self, mock_datetime, mock_coordinator, mock_config_entry) -> None:
+    def test_extra_state_attributes(self, mock_coordinator, mock_config_entry) -> None:
         """Test extra state attributes."""
-        mock_datetime.now.return_value.weekday.return_value = 2
-        
-        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry, 8.0)
+        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry)
         attributes = sensor.extra_state_attributes
         
         assert attributes["target_hours"] == 24.0
         assert attributes["worked_hours"] == 17.0
 
+    def test_unchanged_state_not_written(
+        self, mock_coordinator, mock_config_entry, mock_timetagger_data
+    ) -> None:
+        """Test coordinator updates only write a state that changed."""
+        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry)
+
+        with patch(
+            "homeassistant.helpers.entity.Entity.async_write_ha_state"
+        ) as mock_write:
+            # Written once when the entity is added
+            sensor.async_write_ha_state()
+            sensor._handle_coordinator_update()
+            # Today's hours are neither the value nor an attribute
+            mock_coordinator.data = replace(mock_timetagger_data, today_hours=10.0)
+            sensor._handle_coordinator_update()
+            assert mock_write.call_count == 1
+
+            mock_coordinator.data = replace(mock_timetagger_data, week_target=32.0)
+            sensor._handle_coordinator_update()
+            mock_coordinator.last_update_success = False
+            sensor._handle_coordinator_update()
+            assert mock_write.call_count == 3
+
+    def test_stale_data_served(self, mock_coordinator, mock_config_entry) -> None:
+        """Test failed refreshes keep the last data, marked as stale."""
+        sensor = TTRemainingWeek(mock_coordinator, mock_config_entry)
+        mock_coordinator.last_update_success = False
+
+        assert sensor.available
+        assert sensor.native_value == 7.0
+        assert sensor.extra_state_attributes["stale"] is True
+
+        mock_coordinator.data = None
+        assert not sensor.available
+
 
 class TestTTMonthlyBalance:
     """Test TTMonthlyBalance sensor."""
 
     def test_attributes(self, mock_coordinator, mock_config_entry) -> None:
         """Test sensor attributes."""
-        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry, 8.0)
+        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry)
         
         assert sensor._attr_name == "Monthly working time balance"
-        assert sensor._attr_unique_id == "timetagger_monthly_balance"
+        assert sensor._attr_unique_id == "test_entry_id_timetagger_monthly_balance"
         assert sensor._attr_native_unit_of_measurement == "h"
-        assert sensor._daily_target == 8.0
-
-    @patch("custom_components.timetagger.sensor.datetime")
-    def test_monthly_target(self, mock_datetime, mock_coordinator, mock_config_entry) -> None:
-        """Test monthly target calculation."""
-        # Mock January 15th, 2022 (Saturday)
-        mock_datetime.now.return_value = datetime(2022, 1, 15)
-        mock_datetime.side_effect = lambda *args, **kwargs: datetime(*args, **kwargs)
-        
-        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry, 8.0)
-        
-        # Calculate expected workdays from Jan 1-15, 2022
-        # 1-2: Weekend, 3-7: 5 weekdays, 8-9: Weekend, 10-14: 5 weekdays, 15: Saturday
-        # Total weekdays: 10
-        expected_target = 10 * 8.0  # 80 hours
-        
-        assert sensor._monthly_target() == expected_target
 
-    @patch("custom_components.timetagger.sensor.datetime")
-    def test_native_value(self, mock_datetime, mock_coordinator, mock_config_entry) -> None:
+    def test_native_value(self, mock_coordinator, mock_config_entry) -> None:
         """Test native value calculation."""
-        # Mock a date where monthly target would be 80 hours
-        mock_datetime.now.return_value = datetime(2022, 1, 15)
-        mock_datetime.side_effect = lambda *args, **kwargs: datetime(*args, **kwargs)
-        
-        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry, 8.0)
+        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry)
         
         # Worked: 25h (from mock data)
         # Target: 80h (10 weekdays * 8h)
         # Balance: 25h - 80h = -55h (negative)
         assert sensor.native_value == -55.0
 
-    @patch("custom_components.timetagger.sensor.datetime")
-    def test_extra_state_attributes(self, mock_datetime, mock_coordinator, mock_config_entry) -> None:
+    def test_extra_state_attributes(self, mock_coordinator, mock_config_entry) -> None:
         """Test extra state attributes."""
-        mock_datetime.now.return_value = datetime(2022, 1, 15)
-        mock_datetime.side_effect = lambda *args, **kwargs: datetime(*args, **kwargs)
-        
-        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry, 8.0)
+        sensor = TTMonthlyBalance(mock_coordinator, mock_config_entry)
         attributes = sensor.extra_state_attributes
         
         assert attributes["worked_hours"] == 25.0
-        assert attributes["target_hours"] == 80.0
\ No newline at end of file
+        assert attributes["target_hours"] == 80.0
+
+
+class TestTTRefreshDuration:
+    """Test TTRefreshDuration sensor."""
+
+    def test_attributes(self, mock_coordinator, mock_config_entry) -> None:
+        """Test the sensor is a diagnostic entity disabled by default."""
+        sensor = TTRefreshDuration(mock_coordinator, mock_config_entry)
+
+        assert sensor._attr_unique_id == "test_entry_id_timetagger_refresh_duration"
+        assert sensor._attr_entity_category == "diagnostic"
+        assert sensor._attr_entity_registry_enabled_default is False
+
+    def test_native_value(self, mock_coordinator, mock_config_entry) -> None:
+        """Test the state is the last refresh duration with percentiles."""
+        mock_coordinator.metrics = FetchMetrics()
+        sensor = TTRefreshDuration(mock_coordinator, mock_config_entry)
+        assert sensor.native_value is None
+
+        mock_coordinator.metrics.add(RefreshSample(total=0.5, requests=1, bytes=10))
+        mock_coordinator.metrics.add(RefreshSample(total=0.25, requests=1, bytes=20))
+        mock_coordinator.metrics.add_error(TimeoutError())
+        attributes = sensor.extra_state_attributes
+
+        assert sensor.native_value == 0.25
+        assert attributes["total_p50"] == 0.25
+        assert attributes["total_max"] == 0.5
+        assert attributes["last_bytes"] == 20
+        assert attributes["errors"] == 1
+
+
+class TestTTTagGroupWeek:
+    """Test TTTagGroupWeek sensor."""
+
+    async def test_setup_per_group(
+        self, hass: HomeAssistant, mock_coordinator, mock_config_entry
+    ) -> None:
+        """Test one sensor is added per tag group."""
+        mock_coordinator.tag_groups = parse_tag_groups(
+            "Meetings: #meeting; On-call: #oncall"
+        )
+        hass.data.setdefault(DOMAIN, {})
+        hass.data[DOMAIN][mock_config_entry.entry_id] = mock_coordinator
+        entities = []
+
+        await async_setup_entry(hass, mock_config_entry, entities.extend)
+
+        groups = entities[6:]
+        assert [sensor._attr_name for sensor in groups] == [
+            "Meetings this week",
+            "On-call this week",
+        ]
+        assert (
+            groups[1]._attr_unique_id == "test_entry_id_timetagger_group_on_call_week"
+        )
+        assert groups[0].native_value is None
+
+    def test_native_value(self, mock_coordinator, mock_config_entry) -> None:
+        """Test the state is the week total of the group."""
+        mock_coordinator.tag_groups = parse_tag_groups("On-call: #oncall -#private")
+        mock_coordinator.data = replace(
+            mock_coordinator.data,
+            groups={
+                "On-call": GroupHours(today=1.5, week=4.0, month=9.0, week_records=3)
+            },
+        )
+        sensor = TTTagGroupWeek(mock_coordinator, mock_config_entry, "On-call")
+
+        assert sensor.native_value == 4.0
+        assert sensor.extra_state_attributes == {
+            "tag_filter": "#oncall -#private",
+            "today_hours": 1.5,
+            "month_hours": 9.0,
+            "week_records": 3,
+        }
+
+
+class TestTTTagWeek:
+    """Test the per-tag TTTagWeek sensors."""
+
+    async def test_sensors_follow_tags(
+        self, hass: HomeAssistant, mock_coordinator
+    ) -> None:
+        """Test a sensor is added for every new tag and removed with it."""
+        entry = ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="TimeTagger",
+            data={CONF_WORK_TAGS: "#work", CONF_TAG_BREAKDOWN: True},
+            source="user",
+            entry_id="tags_entry_id",
+        )
+        hours = GroupHours(today=1.0, week=2.0, month=3.0, week_records=2)
+        mock_coordinator.data = replace(
+            mock_coordinator.data, tags={"#call": hours, "#client-a": hours}
+        )
+        mock_coordinator.async_add_listener = MagicMock(return_value=lambda: None)
+        hass.data.setdefault(DOMAIN, {})
+        hass.data[DOMAIN][entry.entry_id] = mock_coordinator
+        entities = []
+
+        await async_setup_entry(hass, entry, entities.extend)
+
+        tags = entities[6:]
+        assert all(isinstance(sensor, TTTagWeek) for sensor in tags)
+        assert [sensor.tag for sensor in tags] == ["#call", "#client-a"]
+        assert tags[1]._attr_unique_id == "tags_entry_id_timetagger_tag_client_a_week"
+        assert tags[1].native_value == 2.0
+        assert tags[1].extra_state_attributes == {
+            "today_hours": 1.0,
+            "month_hours": 3.0,
+            "week_records": 2,
+        }
+
+        registry = er.async_get(hass)
+        tags[0].entity_id = registry.async_get_or_create(
+            "sensor", DOMAIN, "tags_entry_id_timetagger_tag_call_week"
+        ).entity_id
+        mock_coordinator.data = replace(
+            mock_coordinator.data, tags={"#client-a": hours, "#review": hours}
+        )
+        mock_coordinator.async_add_listener.call_args.args[0]()
+
+        assert [sensor.tag for sensor in entities[8:]] == ["#review"]
+        assert registry.async_get(tags[0].entity_id) is None
+        assert tags[0].native_value is None
+
+    async def test_vanished_tags_removed_on_setup(
+        self, hass: HomeAssistant, mock_coordinator
+    ) -> None:
+        """Test sensors of tags no longer in use are removed from the registry."""
+        entry = ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="TimeTagger",
+            data={CONF_WORK_TAGS: "#work", CONF_TAG_BREAKDOWN: True},
+            source="user",
+            entry_id="tags_entry_id",
+        )
+        hours = GroupHours(today=1.0, week=2.0, month=3.0, week_records=2)
+        mock_coordinator.data = replace(mock_coordinator.data, tags={"#call": hours})
+        mock_coordinator.async_add_listener = MagicMock(return_value=lambda: None)
+        hass.data.setdefault(DOMAIN, {})
+        hass.data[DOMAIN][entry.entry_id] = mock_coordinator
+        registry = er.async_get(hass)
+        stored = [
+            registry.async_get_or_create("sensor", DOMAIN, unique_id)
+            for unique_id in (
+                "tags_entry_id_timetagger_tag_call_week",
+                "tags_entry_id_timetagger_tag_old_week",
+                "tags_entry_id_timetagger_work_today",
+            )
+        ]
+
+        with patch(
+            "custom_components.timetagger.sensor.er.async_entries_for_config_entry",
+            return_value=stored,
+        ):
+            await async_setup_entry(hass, entry, lambda entities: None)
+
+        assert registry.async_get(stored[0].entity_id) is not None
+        assert registry.async_get(stored[1].entity_id) is None
+        assert registry.async_get(stored[2].entity_id) is not None
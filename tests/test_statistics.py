@@ -0,0 +1,153 @@
+"""Test TimeTagger long-term statistics."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.timetagger.records import IntervalIndex
+from custom_components.timetagger.statistics import (
+    WorkStatistics,
+    hourly_statistics,
+    statistic_id,
+)
+
+# 2022-01-01 00:00 UTC
+MIDNIGHT = 1640995200.0
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+
+@pytest.fixture
+def mock_recorder():
+    """Run recorder jobs inline and capture imported statistics."""
+    instance = MagicMock()
+    instance.async_add_executor_job = AsyncMock(
+        side_effect=lambda func, *args: func(*args)
+    )
+    with patch(
+        "custom_components.timetagger.statistics.get_instance",
+        return_value=instance,
+    ), patch(
+        "custom_components.timetagger.statistics.get_last_statistics",
+        return_value={},
+    ) as mock_last, patch(
+        "custom_components.timetagger.statistics.statistics_during_period",
+        return_value={},
+    ) as mock_period, patch(
+        "custom_components.timetagger.statistics.async_add_external_statistics"
+    ) as mock_add:
+        yield mock_last, mock_period, mock_add
+
+
+def _imported(mock_add) -> list[dict]:
+    return [row for call in mock_add.call_args_list for row in call.args[2]]
+
+
+def test_statistic_id() -> None:
+    """Test statistic ids are valid external statistic ids."""
+    assert statistic_id("01ABC") == "timetagger:work_hours_01abc"
+
+
+def test_hourly_statistics() -> None:
+    """Test hours are split per hour with a running sum."""
+    # 00:30 - 02:00 and an overlapping 01:00 - 01:30
+    index = IntervalIndex(
+        [
+            (MIDNIGHT + 1800, MIDNIGHT + 2 * HOUR),
+            (MIDNIGHT + HOUR, MIDNIGHT + HOUR + 1800),
+        ]
+    )
+
+    statistics, total = hourly_statistics(index, MIDNIGHT, MIDNIGHT + 3 * HOUR, 10.0)
+
+    assert [row["state"] for row in statistics] == [0.5, 1.0, 0.0]
+    assert [row["sum"] for row in statistics] == [10.5, 11.5, 11.5]
+    assert statistics[0]["start"] == datetime(2022, 1, 1, tzinfo=timezone.utc)
+    assert total == 11.5
+
+
+async def test_backfill_in_chunks(hass: HomeAssistant, mock_recorder) -> None:
+    """Test the history is fetched and imported chunk by chunk."""
+    _, _, mock_add = mock_recorder
+    statistics = WorkStatistics(hass, "entry", 56)
+    # One hour of work every day at 08:00
+    fetch = AsyncMock(
+        side_effect=lambda start, end: IntervalIndex(
+            (day + 8 * HOUR, day + 9 * HOUR)
+            for day in range(int(start - start % DAY), int(end), int(DAY))
+        )
+    )
+
+    await statistics.async_backfill(fetch, MIDNIGHT)
+
+    assert [call.args for call in fetch.call_args_list] == [
+        (MIDNIGHT - 56 * DAY, MIDNIGHT - 28 * DAY),
+        (MIDNIGHT - 28 * DAY, MIDNIGHT),
+    ]
+    rows = _imported(mock_add)
+    assert len(rows) == 56 * 24
+    assert rows[-1]["sum"] == 56.0
+    assert mock_add.call_args.args[1]["statistic_id"] == "timetagger:work_hours_entry"
+    assert statistics.ready
+
+
+async def test_backfill_resumes(hass: HomeAssistant, mock_recorder) -> None:
+    """Test a backfill continues after the latest imported hour."""
+    mock_last, _, mock_add = mock_recorder
+    mock_last.return_value = {
+        "timetagger:work_hours_entry": [{"start": MIDNIGHT - 2 * HOUR, "sum": 40.0}]
+    }
+    statistics = WorkStatistics(hass, "entry", 365)
+    fetch = AsyncMock(
+        return_value=IntervalIndex([(MIDNIGHT - HOUR, MIDNIGHT - 1800)])
+    )
+
+    await statistics.async_backfill(fetch, MIDNIGHT)
+
+    fetch.assert_called_once_with(MIDNIGHT - HOUR, MIDNIGHT)
+    assert [row["sum"] for row in _imported(mock_add)] == [40.5]
+
+
+async def test_update_continues_backfill(hass: HomeAssistant, mock_recorder) -> None:
+    """Test the window continues the backfilled sum before it is committed."""
+    _, mock_period, mock_add = mock_recorder
+    statistics = WorkStatistics(hass, "entry", 1)
+    fetch = AsyncMock(return_value=IntervalIndex([(MIDNIGHT - HOUR, MIDNIGHT)]))
+    await statistics.async_backfill(fetch, MIDNIGHT)
+
+    index = IntervalIndex([(MIDNIGHT, MIDNIGHT + HOUR)])
+    await statistics.async_update(index, MIDNIGHT, MIDNIGHT + 1.5 * HOUR, True)
+
+    mock_period.assert_not_called()
+    assert _imported(mock_add)[-1]["sum"] == 2.0
+
+
+async def test_update_window(hass: HomeAssistant, mock_recorder) -> None:
+    """Test the window is imported after changes and new full hours."""
+    _, mock_period, mock_add = mock_recorder
+    mock_period.return_value = {
+        "timetagger:work_hours_entry": [{"start": MIDNIGHT - HOUR, "sum": 100.0}]
+    }
+    statistics = WorkStatistics(hass, "entry", 365)
+    index = IntervalIndex([(MIDNIGHT, MIDNIGHT + 1.5 * HOUR)])
+
+    # Nothing is imported before the backfill finished
+    await statistics.async_update(index, MIDNIGHT, MIDNIGHT + 2.5 * HOUR, True)
+    mock_add.assert_not_called()
+
+    statistics.ready = True
+    await statistics.async_update(index, MIDNIGHT, MIDNIGHT + 2.5 * HOUR, True)
+    assert [row["sum"] for row in _imported(mock_add)] == [101.0, 101.5]
+
+    # Same full hour without changes
+    await statistics.async_update(index, MIDNIGHT, MIDNIGHT + 2.9 * HOUR, False)
+    assert mock_add.call_count == 1
+
+    # The next hour completed
+    await statistics.async_update(index, MIDNIGHT, MIDNIGHT + 3.1 * HOUR, False)
+    assert mock_add.call_count == 2
+    assert len(mock_add.call_args.args[2]) == 3
@@ -0,0 +1,132 @@
+"""Test the TimeTagger target calendar."""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import pytest
+
+from custom_components.timetagger.targets import (
+    TargetCalendar,
+    parse_days,
+    parse_schedule,
+)
+
+WEEKDAYS = parse_schedule("", 8.0)
+
+
+@pytest.mark.parametrize(
+    "day,expected_target",
+    [
+        (date(2022, 1, 3), 8.0),  # Monday, 1 day * 8 hours
+        (date(2022, 1, 5), 24.0),  # Wednesday, 3 days * 8 hours
+        (date(2022, 1, 7), 40.0),  # Friday, 5 days * 8 hours
+        (date(2022, 1, 8), 40.0),  # Saturday, capped at 5 days
+        (date(2022, 2, 2), 24.0),  # Wednesday, week started in January
+    ],
+)
+def test_week_target(day, expected_target) -> None:
+    """Test week target calculation."""
+    assert TargetCalendar(WEEKDAYS).week_target(day) == expected_target
+
+
+def test_month_target() -> None:
+    """Test monthly target calculation."""
+    calendar = TargetCalendar(WEEKDAYS)
+
+    # 1-2: Weekend, 3-7: 5 weekdays, 8-9: Weekend, 10-14: 5 weekdays, 15: Saturday
+    assert calendar.month_target(date(2022, 1, 15)) == 80.0
+    assert calendar.month_target(date(2022, 1, 31)) == 168.0
+
+
+def test_targets_match_day_by_day_sum() -> None:
+    """Test the tables agree with adding up every single day."""
+    calendar = TargetCalendar(
+        (8.0, 7.5, 8.0, 8.0, 6.25, 1.0, 0.0),
+        {date(2024, 2, 29), date(2024, 12, 31)},
+        {(1, 1), (12, 25)},
+    )
+    day = date(2023, 12, 1)
+    while day < date(2025, 2, 1):
+        month = sum(
+            calendar.day_target(day.replace(day=d)) for d in range(1, day.day + 1)
+        )
+        week = sum(
+            calendar.day_target(day - timedelta(days=d))
+            for d in range(day.weekday() + 1)
+        )
+        assert calendar.targets(day) == (round(week, 2), round(month, 2))
+        day += timedelta(days=1)
+
+
+def test_days_off() -> None:
+    """Test holidays and vacation have no target."""
+    holidays, yearly = parse_days("12-25, 12-26")
+    vacation, _ = parse_days("2024-12-23..2024-12-24")
+    calendar = TargetCalendar(WEEKDAYS, holidays | vacation, yearly)
+
+    assert calendar.day_target(date(2024, 12, 20)) == 8.0
+    assert calendar.day_target(date(2024, 12, 24)) == 0.0
+    assert calendar.day_target(date(2030, 12, 25)) == 0.0
+    # Only Friday the 27th is left of the week
+    assert calendar.week_target(date(2024, 12, 29)) == 8.0
+
+
+def test_targets_cached_per_day() -> None:
+    """Test the targets of a day and the month tables are computed once."""
+    calendar = TargetCalendar(WEEKDAYS)
+
+    first = calendar.targets(date(2022, 1, 14))
+    assert calendar.targets(date(2022, 1, 14)) is first
+    assert calendar.targets(date(2022, 1, 17)) == (8.0, 88.0)
+    assert list(calendar._months) == [(2022, 1)]
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("", (8.0, 8.0, 8.0, 8.0, 8.0, 0.0, 0.0)),
+        ("8 8 8 8 6 0 0", (8.0, 8.0, 8.0, 8.0, 6.0, 0.0, 0.0)),
+        ("7.5,7.5,7.5,7.5,7.5,4,0", (7.5, 7.5, 7.5, 7.5, 7.5, 4.0, 0.0)),
+    ],
+)
+def test_parse_schedule(value, expected) -> None:
+    """Test parsing the hours of the weekdays."""
+    assert parse_schedule(value, 8.0) == expected
+
+
+@pytest.mark.parametrize("value", ["8 8 8 8 8", "8 8 8 8 8 0 25", "a b c d e f g"])
+def test_parse_schedule_invalid(value) -> None:
+    """Test schedules without seven valid hours are rejected."""
+    with pytest.raises(ValueError):
+        parse_schedule(value, 8.0)
+
+
+def test_parse_days() -> None:
+    """Test parsing dates, ranges and yearly days."""
+    dates, yearly = parse_days("2025-04-18; 12-25, 2025-08-30..2025-09-02, 2-29")
+
+    assert dates == {
+        date(2025, 4, 18),
+        date(2025, 8, 30),
+        date(2025, 8, 31),
+        date(2025, 9, 1),
+        date(2025, 9, 2),
+    }
+    assert yearly == {(12, 25), (2, 29)}
+    assert parse_days("") == (frozenset(), frozenset())
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2025-13-01",
+        "christmas",
+        "12-24..12-26",
+        "2025-08-15..2025-08-04",
+        "2020-01-01..2025-01-01",
+    ],
+)
+def test_parse_days_invalid(value) -> None:
+    """Test invalid days and ranges are rejected."""
+    with pytest.raises(ValueError):
+        parse_days(value)